@@ -217,20 +217,18 @@ class ItemAdmin(TabbedLanguageMixin, SortableAdminBase, ModelAdmin):
         },
     }
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).prefetch_related('images', 'remote_images')
-
     def _display_date(self, obj):
-        return obj.get_display_date()
+        return obj.get_display_cache()['display_date']
     _display_date.short_description = 'Date'
 
     def _image_count(self, obj):
-        return f'Public {obj.get_public_image_count()} / Private {obj.get_private_image_count()} / Remote {obj.remote_images.count()}'
+        display_cache = obj.get_display_cache()
+        return f'Public {display_cache["public_image_count"]} / Private {display_cache["private_image_count"]} / Remote {display_cache["remote_image_count"]}'
     _image_count.short_description = '# Images'
 
     def _display_image(self, obj):
         # default image
-        image = obj.get_first_public_image()
-        url = image.thumbnail.url if image and image.image and image.thumbnail and image.thumbnail.url else static('images/no-img.svg')
+        thumbnail = obj.get_display_cache()['thumbnail']
+        url = thumbnail['url'] if thumbnail else static('images/no-img.svg')
         return mark_safe(f'<img src="{url}" style="max-width: 100%; max-height: 100px" />')
     _display_image.short_description = 'Display Image Preview'
@@ -6,3 +6,5 @@ class DigitalMaryConfig(AppConfig):
     name = 'digital_mary'
     verbose_name = 'Digital Mary'
 
+    def ready(self):
+        from . import signals
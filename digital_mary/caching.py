@@ -0,0 +1,152 @@
+from hashlib import md5
+from threading import local
+from time import time_ns
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.utils.translation import get_language
+
+from .models import ContentVersion
+from .display_cache import refresh_display_cache
+from .search import refresh_search_documents
+
+GLOBAL_CONTENT_VERSION = 'global'
+ABOUT_CONTENT_VERSION = 'about'
+
+_pending = local()
+
+def get_item_content_version_key(item_id):
+    return f'item:{item_id}'
+
+def get_content_versions(request, keys):
+    """
+    Returns `{key: (version, updated)}` for the content keys (memoized per request).
+
+    Versions are stored in the database so every worker sees a bump regardless of the cache backend.
+    """
+    if not hasattr(request, '_content_versions'):
+        request._content_versions = {}
+    missing_keys = [key for key in keys if key not in request._content_versions]
+    if missing_keys:
+        request._content_versions.update({key: (0, None) for key in missing_keys})
+        request._content_versions.update({
+            key: (version, updated)
+            for key, version, updated in ContentVersion.objects.filter(key__in=missing_keys).values_list('key', 'version', 'updated')
+        })
+    return {key: request._content_versions[key] for key in keys}
+
+def get_content_version(request, keys=(GLOBAL_CONTENT_VERSION,)):
+    return '-'.join(str(version) for version, _ in get_content_versions(request, keys).values())
+
+def get_content_last_modified(request, keys=(GLOBAL_CONTENT_VERSION,)):
+    updated = [updated for _, updated in get_content_versions(request, keys).values() if updated]
+    return max(updated) if updated else None
+
+def bump_content_versions(keys):
+    keys = set(keys)
+    # start new counters from the current time so a recreated counter never reuses old cache keys
+    ContentVersion.objects.bulk_create([ContentVersion(key=key, version=time_ns()) for key in keys], ignore_conflicts=True)
+    ContentVersion.objects.filter(key__in=keys).update(version=F('version') + 1, updated=timezone.now())
+
+def queue_content_change(item_ids=(), version_keys=()):
+    """
+    Collects changes until the transaction commits, then refreshes the display cache and search document
+    of the changed items and bumps the global, per-item and other given content versions once.
+    """
+    pending = getattr(_pending, 'changes', None)
+    if pending is None:
+        pending = _pending.changes = {'item_ids': set(), 'version_keys': set()}
+    pending['item_ids'].update(item_id for item_id in item_ids if item_id)
+    pending['version_keys'].update(version_keys)
+    transaction.on_commit(_flush_content_changes)
+
+def _flush_content_changes():
+    # the first callback after a commit handles everything pending, the rest are no-ops
+    pending = getattr(_pending, 'changes', None)
+    _pending.changes = None
+    if pending is None:
+        return
+    # refresh before bumping so a new version never caches stale display data
+    refresh_display_cache(pending['item_ids'])
+    refresh_search_documents(pending['item_ids'])
+    bump_content_versions(
+        [GLOBAL_CONTENT_VERSION] +
+        [get_item_content_version_key(item_id) for item_id in pending['item_ids']] +
+        list(pending['version_keys'])
+    )
+
+def get_visitor_scope(request):
+    # staff pages can differ (admin links) so they never share cached responses or validators with the public
+    return 'staff' if request.user.is_staff else 'public'
+
+class ContentVersionMixin:
+    content_version_keys = [GLOBAL_CONTENT_VERSION]
+
+    def get_content_version_keys(self):
+        return self.content_version_keys
+
+class ConditionalResponseMixin(ContentVersionMixin):
+    """
+    Answers GET requests with 304 Not Modified (before any rendering) using an ETag and Last-Modified
+    derived from the content versions of the page and the visitor scope.
+    """
+    def resolve_object(self):
+        # views of a single object look it up here (raising `Http404`)
+        pass
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+        # a missing or private object is always a 404, never a 304
+        self.resolve_object()
+        # pending messages must be rendered
+        if len(messages.get_messages(request)) > 0:
+            return super().dispatch(request, *args, **kwargs)
+
+        keys = self.get_content_version_keys()
+        # deploys can change templates so the etag includes the commit
+        etag = quote_etag(f'{settings.GIT_COMMIT_SHORT}-{get_language()}-{get_visitor_scope(request)}-{get_content_version(request, keys)}')
+        last_modified = get_content_last_modified(request, keys)
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().dispatch(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response.headers.setdefault('ETag', etag)
+            if last_modified:
+                response.headers.setdefault('Last-Modified', http_date(last_modified))
+            # browsers must revalidate instead of guessing a freshness lifetime from Last-Modified
+            patch_cache_control(response, no_cache=True)
+        return response
+
+class CachedResponseMixin(ContentVersionMixin):
+    """
+    Caches rendered GET responses keyed by path, language, visitor scope and content version.
+    """
+    def is_response_cacheable(self, request):
+        return settings.CACHE_SECONDS > 0 and request.method in ('GET', 'HEAD') and len(messages.get_messages(request)) == 0
+
+    def get_response_cache_key(self, request):
+        path = md5(request.get_full_path().encode()).hexdigest()
+        return f'view:{path}:{get_language()}:{get_visitor_scope(request)}:{get_content_version(request, self.get_content_version_keys())}'
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_response_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        cache_key = self.get_response_cache_key(request)
+        response = cache.get(cache_key)
+        if response is not None:
+            return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda rendered: cache.set(cache_key, rendered, settings.CACHE_SECONDS))
+        return response
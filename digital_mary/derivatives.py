@@ -0,0 +1,195 @@
+from io import BytesIO
+from math import ceil
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image as PILImage, ImageOps, features
+
+# source extension => Pillow format (anything else is saved as JPEG)
+IMAGE_FORMATS = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'PNG',
+    '.webp': 'WEBP',
+}
+
+# responsive widths (the source width is used instead of larger ones)
+RESPONSIVE_WIDTHS = [320, 480, 640, 960, 1280, 1920]
+# in order of preference: (mime type, Pillow format, extension, save options)
+RESPONSIVE_FORMATS = [
+    ('image/avif', 'AVIF', '.avif', {'quality': 60}),
+    ('image/webp', 'WEBP', '.webp', {'quality': 80}),
+]
+RESPONSIVE_DIRECTORY = 'derivatives'
+# IIIF tile pyramids are stored as `iiif/<image id>/<region>/<size>/0/default.jpg` (served by nginx as `/iiif/...`)
+IIIF_DIRECTORY = 'iiif'
+IIIF_TILE_SIZE = 512
+IIIF_QUALITY = 80
+
+def open_source_image(source, draft_size=None):
+    with source.open('rb') as source_file:
+        image = PILImage.open(source_file)
+        if draft_size:
+            # JPEG files are decoded at the smallest DCT scale still covering `draft_size` (other formats ignore it)
+            image.draft(None, draft_size)
+        image.load()
+    # camera orientation
+    return ImageOps.exif_transpose(image)
+
+def save_image(image, image_format, **kwargs):
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        # flatten transparency on white
+        image = image.convert('RGBA')
+        background = PILImage.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    output = BytesIO()
+    image.save(output, format=image_format, **kwargs)
+    return output.getvalue()
+
+def make_thumbnail(source, size, image=None):
+    """
+    Returns a `ContentFile` of the source image fitted inside `size` (same naming and format
+    rules as `django_advance_thumbnail`, other formats are saved as `.jpg`).
+    """
+    image = (image or open_source_image(source)).copy()
+    image.thumbnail(size, PILImage.Resampling.LANCZOS)
+    filename, extension = os.path.splitext(os.path.basename(source.name))
+    image_format = IMAGE_FORMATS.get(extension.lower())
+    if image_format is None:
+        # tiff, gif, bmp... are converted so the extension must match the JPEG content
+        image_format, extension = 'JPEG', '.jpg'
+    return ContentFile(save_image(image, image_format, quality=85, optimize=True), name=f'{filename}_thumbnail{extension}')
+
+def make_responsive_derivatives(source, image=None):
+    """
+    Saves copies of the source image at the `RESPONSIVE_WIDTHS` in every modern format supported by Pillow and
+    returns their manifest `{source, width, height, formats: [{type, sources: [[width, name]]}]}`.
+    """
+    image = image or open_source_image(source)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    stem = os.path.splitext(os.path.basename(source.name))[0]
+    widths = sorted({width for width in RESPONSIVE_WIDTHS if width < image.width} | {min(image.width, RESPONSIVE_WIDTHS[-1])}, reverse=True)
+    formats = [
+        (mime_type, image_format, extension, options, [])
+        for mime_type, image_format, extension, options in RESPONSIVE_FORMATS
+        if features.check(image_format.lower())
+    ]
+    resized = image
+    for width in widths:
+        # each width is resized from the previous (larger) one
+        resized = resized.resize((width, max(1, round(image.height * width / image.width))), PILImage.Resampling.LANCZOS)
+        for _, image_format, extension, options, sources in formats:
+            name = source.storage.save(
+                f'{RESPONSIVE_DIRECTORY}/{stem}-{width}w{extension}',
+                ContentFile(save_image(resized, image_format, **options)),
+            )
+            sources.insert(0, [width, name])
+    return {
+        'source': source.name,
+        'width': image.width,
+        'height': image.height,
+        'formats': [{'type': mime_type, 'sources': sources} for mime_type, _, _, _, sources in formats],
+    }
+
+def delete_directory(storage, directory):
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        storage.delete(f'{directory}/{name}')
+    for name in directories:
+        delete_directory(storage, f'{directory}/{name}')
+
+def get_scale_factors(width, height, tile_size=IIIF_TILE_SIZE):
+    # halve until the whole image fits in one tile
+    scale_factors = [1]
+    while ceil(width / scale_factors[-1]) > tile_size or ceil(height / scale_factors[-1]) > tile_size:
+        scale_factors.append(scale_factors[-1] * 2)
+    return scale_factors
+
+def make_tile_pyramid(source, directory, image=None, tile_size=IIIF_TILE_SIZE):
+    """
+    Replaces `directory` with the IIIF Image API 3 tiles (canonical `x,y,w,h/w,h/0/default.jpg` paths) of every
+    scale factor, plus the `full/w,h` images of the levels fitting in one tile, and returns their manifest
+    `{source, width, height, tile_size, scale_factors, sizes}`.
+    """
+    image = image or open_source_image(source)
+    storage = source.storage
+    width, height = image.size
+
+    def save_tile(path, tile):
+        storage.save(f'{directory}/{path}/0/default.jpg', ContentFile(save_image(tile, 'JPEG', quality=IIIF_QUALITY)))
+
+    delete_directory(storage, directory)
+    scale_factors = get_scale_factors(width, height, tile_size)
+    sizes = []
+    level = image
+    for scale_factor in scale_factors:
+        level_width, level_height = ceil(width / scale_factor), ceil(height / scale_factor)
+        if scale_factor > 1:
+            # each level is resized from the previous (larger) one
+            level = level.resize((level_width, level_height), PILImage.Resampling.LANCZOS)
+        region_size = tile_size * scale_factor
+        for y in range(0, height, region_size):
+            for x in range(0, width, region_size):
+                region_width, region_height = min(region_size, width - x), min(region_size, height - y)
+                tile_width, tile_height = ceil(region_width / scale_factor), ceil(region_height / scale_factor)
+                left, top = x // scale_factor, y // scale_factor
+                save_tile(
+                    f'{x},{y},{region_width},{region_height}/{tile_width},{tile_height}',
+                    level.crop((left, top, left + tile_width, top + tile_height)),
+                )
+        if level_width <= tile_size and level_height <= tile_size:
+            sizes.append({'width': level_width, 'height': level_height})
+            save_tile(f'full/{level_width},{level_height}', level)
+            if scale_factor == 1:
+                save_tile('full/max', level)
+    return {
+        'source': source.name,
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'scale_factors': scale_factors,
+        # smallest first
+        'sizes': sorted(sizes, key=lambda size: size['width']),
+    }
+
+class DerivativesMixin:
+    """
+    Model mixin for images whose derivatives (thumbnail...) are generated in the background by the
+    `process_jobs` worker (see `digital_mary.jobs`), templates show a placeholder until they exist.
+    """
+    source_field_name = 'image'
+    thumbnail_size = (450, 350)
+
+    def has_stale_derivatives(self):
+        return bool(getattr(self, self.source_field_name)) and not self.thumbnail
+
+    def clear_derivatives(self):
+        self.thumbnail = None
+
+    def save(self, *args, **kwargs):
+        source = getattr(self, self.source_field_name)
+        # new uploads are only committed to storage by `pre_save`
+        if not source or not source._committed:
+            self.clear_derivatives()
+        super().save(*args, **kwargs)
+
+    def get_derivative_files(self):
+        return [self.thumbnail.name] if self.thumbnail else []
+
+    def build_derivatives(self, source, image):
+        # returns the updated fields
+        self.thumbnail = make_thumbnail(source, self.thumbnail_size, image)
+        return ['thumbnail']
+
+    def generate_derivatives(self):
+        source = getattr(self, self.source_field_name)
+        stale_files = self.get_derivative_files()
+        update_fields = self.build_derivatives(source, open_source_image(source))
+        self.save(update_fields=update_fields)
+        # old files are only removed once nothing references them
+        for name in set(stale_files) - set(self.get_derivative_files()):
+            source.storage.delete(name)
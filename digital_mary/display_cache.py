@@ -0,0 +1,21 @@
+from django.db.models import Prefetch
+
+from .models import Item, Contribution
+
+def get_display_cache_queryset():
+    return Item.objects \
+        .select_related('provenance', 'provenience', 'findspot', 'inscription_style') \
+        .prefetch_related(
+            'categories', 'cultures', 'languages', 'materials', 'techniques', 'subjects',
+            'images', 'remote_images',
+            Prefetch('contributions', queryset=Contribution.objects.select_related('person')),
+        )
+
+def refresh_display_cache(item_ids, batch_size=500):
+    item_ids = list(item_ids)
+    for index in range(0, len(item_ids), batch_size):
+        items = list(get_display_cache_queryset().filter(pk__in=item_ids[index:index + batch_size]))
+        for item in items:
+            item.display_cache = item.build_display_cache()
+        # bulk_update skips `updated` auto_now and model signals
+        Item.objects.bulk_update(items, ['display_cache'])
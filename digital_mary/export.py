@@ -0,0 +1,151 @@
+import csv
+from hashlib import md5
+import json
+from tempfile import TemporaryFile
+
+from django.core.files import File
+from django.db.models import Prefetch
+from django.urls import reverse
+
+from .models import Item, Image, Contribution
+from .marc_relators import MarcRelator
+from .derivatives import delete_directory
+
+EXPORT_CHUNK_SIZE = 500
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/jsonl; charset=utf-8',
+    'jsonld': 'application/ld+json; charset=utf-8',
+}
+TERM_FIELDS = ['categories', 'cultures', 'languages', 'materials', 'techniques', 'subjects']
+LOCATION_FIELDS = ['provenance', 'provenience', 'findspot']
+CSV_COLUMNS = [
+    'id', 'url', 'name', 'name_ar', 'display_date', 'earliest_creation', 'latest_creation',
+    'description', 'inscription', 'translated_inscription', 'dimensions', 'inscription_style',
+    *TERM_FIELDS, *LOCATION_FIELDS, 'contributors', 'images', 'remote_images',
+]
+# exports served by `ExportView` are stored as `exports/<content version>-<base url hash>/digital-mary-items.<format>`
+EXPORT_DIRECTORY = 'exports'
+# longest time a worker may take to write an export
+EXPORT_LOCK_SECONDS = 60 * 10
+# values of list columns are joined in csv exports
+CSV_LIST_SEPARATOR = ' | '
+
+class Echo:
+    # file-like object for `csv.writer` that returns the written row
+    def write(self, value):
+        return value
+
+def get_export_queryset():
+    # `iterator(chunk_size=...)` runs the prefetches once per chunk
+    return Item.objects \
+        .filter(is_public=True) \
+        .select_related('provenance', 'provenience', 'findspot', 'inscription_style') \
+        .prefetch_related(
+            *TERM_FIELDS,
+            Prefetch('images', queryset=Image.objects.filter(is_public=True), to_attr='public_images'),
+            'remote_images',
+            Prefetch('contributions', queryset=Contribution.objects.select_related('person')),
+        ) \
+        .order_by('pk')
+
+def serialize_item(item, base_url=''):
+    return {
+        'id': item.pk,
+        'url': base_url + reverse('item', kwargs={'pk': item.pk}),
+        'name': item.name,
+        'name_ar': item.name_ar,
+        'display_date': str(item.get_display_date()),
+        'earliest_creation': item.earliest_creation,
+        'latest_creation': item.latest_creation,
+        'description': item.description,
+        'inscription': item.inscription,
+        'translated_inscription': item.translated_inscription,
+        'dimensions': item.dimensions,
+        'inscription_style': item.inscription_style.label if item.inscription_style else None,
+        **{field_name: [term.label for term in getattr(item, field_name).all()] for field_name in TERM_FIELDS},
+        **{field_name: getattr(item, field_name).label if getattr(item, field_name) else None for field_name in LOCATION_FIELDS},
+        'contributors': [
+            {
+                'name': str(contribution.person),
+                'roles': [MarcRelator(marc_relator).label for marc_relator in contribution.marc_relators],
+            }
+            for contribution in item.contributions.all()
+        ],
+        'images': [base_url + image.image.url for image in item.public_images if image.image],
+        'remote_images': [remote_image.url for remote_image in item.remote_images.all()],
+    }
+
+def serialize_item_jsonld(record):
+    return {
+        '@id': record['url'],
+        '@type': 'VisualArtwork',
+        'identifier': record['id'],
+        'name': [name for name in [record['name'], {'@value': record['name_ar'], '@language': 'ar'} if record['name_ar'] else None] if name],
+        'temporalCoverage': record['display_date'],
+        'description': record['description'],
+        'text': record['inscription'],
+        'artMedium': record['materials'],
+        'artform': record['categories'],
+        'genre': record['cultures'],
+        'inLanguage': record['languages'],
+        'about': record['subjects'],
+        'locationCreated': record['provenance'],
+        'contributor': [
+            {'@type': 'Person', 'name': contributor['name'], 'roleName': contributor['roles']}
+            for contributor in record['contributors']
+        ],
+        'image': record['images'] + record['remote_images'],
+    }
+
+def iter_export_records(base_url=''):
+    for item in get_export_queryset().iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield serialize_item(item, base_url)
+
+def stream_export(export_format, base_url=''):
+    """
+    Yields the public catalogue as `csv`, `jsonl` or `jsonld` text chunks (one item at a time, constant memory).
+    """
+    records = iter_export_records(base_url)
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(CSV_COLUMNS)
+        for record in records:
+            yield writer.writerow([
+                CSV_LIST_SEPARATOR.join(
+                    f'{value["name"]} ({", ".join(value["roles"])})' if isinstance(value, dict) else str(value)
+                    for value in record[column]
+                ) if isinstance(record[column], list) else record[column]
+                for column in CSV_COLUMNS
+            ])
+    elif export_format == 'jsonl':
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + '\n'
+    elif export_format == 'jsonld':
+        yield '{"@context": {"@vocab": "https://schema.org/"}, "@graph": [\n'
+        for index, record in enumerate(records):
+            yield (',\n' if index else '') + json.dumps(serialize_item_jsonld(record), ensure_ascii=False)
+        yield '\n]}\n'
+    else:
+        raise ValueError(f'Unknown export format: {export_format}')
+
+def get_export_name(export_format, base_url, content_version):
+    # item and image urls of the records depend on the base url
+    return f'{EXPORT_DIRECTORY}/{content_version}-{md5(base_url.encode()).hexdigest()[:12]}/digital-mary-items.{export_format}'
+
+def save_export(storage, name, export_format, content_version, base_url=''):
+    """
+    Writes the export to `name` in storage (through a temporary file) and deletes the exports of other content versions.
+    """
+    with TemporaryFile() as output:
+        for chunk in stream_export(export_format, base_url):
+            output.write(chunk.encode())
+        output.seek(0)
+        saved_name = storage.save(name, File(output))
+    # another worker saved the same export meanwhile
+    if saved_name != name:
+        storage.delete(saved_name)
+    for directory in storage.listdir(EXPORT_DIRECTORY)[0]:
+        if not directory.startswith(f'{content_version}-'):
+            delete_directory(storage, f'{EXPORT_DIRECTORY}/{directory}')
+            storage.delete(f'{EXPORT_DIRECTORY}/{directory}')
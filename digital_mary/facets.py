@@ -0,0 +1,104 @@
+from hashlib import md5
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from .models import Item
+
+# facet name => item m2m field name
+M2M_FACETS = {
+    'category': 'categories',
+    'culture': 'cultures',
+    'language': 'languages',
+    'material': 'materials',
+    'technique': 'techniques',
+    'subject': 'subjects',
+}
+FACET_NAMES = list(M2M_FACETS.keys()) + ['inscription_style', 'location', 'period']
+
+def normalize_search_value(value):
+    if isinstance(value, str):
+        return value.strip().lower()
+    if hasattr(value, '__iter__'):
+        return sorted(getattr(item, 'pk', item) for item in value)
+    return getattr(value, 'pk', value)
+
+def get_search_cache_key(prefix, search_data, content_version):
+    normalized = {
+        key: normalize_search_value(value)
+        for key, value in search_data.items() if value
+    }
+    return f'{prefix}:{content_version}:' + md5(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+
+def get_facet_cache_key(search_data, content_version):
+    return get_search_cache_key('item_facets', search_data, content_version)
+
+def get_facet_counts(queryset, search_data, content_version, facet_querysets=None):
+    """
+    Returns `{facet_name: {term_pk_or_period: count}}` for every search filter over the filtered item queryset
+    (or the queryset of `facet_querysets` given for a facet, see `ItemSearchMixin.get_facet_querysets`).
+    """
+    cache_key = get_facet_cache_key(search_data, content_version)
+    facet_counts = cache.get(cache_key)
+    if facet_counts is None:
+        facet_counts = _query_facet_counts(queryset, facet_querysets or {})
+        cache.set(cache_key, facet_counts, settings.FACET_CACHE_SECONDS)
+    return facet_counts
+
+def _query_facet_counts(queryset, facet_querysets):
+    item_table = Item._meta.db_table
+    # facet name => materialized CTE of the item ids it is counted over
+    sources, ctes, params = {}, {}, []
+    for facet in FACET_NAMES:
+        source = sources[facet] = f'filtered_{facet}' if facet in facet_querysets else 'filtered'
+        if source not in ctes:
+            ctes[source], source_params = facet_querysets.get(facet, queryset).order_by().values('pk').query.sql_with_params()
+            params += source_params
+
+    selects = []
+    for facet, field_name in M2M_FACETS.items():
+        field = Item._meta.get_field(field_name)
+        through = field.remote_field.through._meta
+        term_column = through.get_field(field.m2m_reverse_field_name()).column
+        item_column = through.get_field(field.m2m_field_name()).column
+        selects.append(f'''
+            SELECT '{facet}', t.{term_column}, COUNT(*)
+            FROM {through.db_table} t
+            JOIN {sources[facet]} f ON f.id = t.{item_column}
+            GROUP BY t.{term_column}
+        ''')
+    selects.append(f'''
+        SELECT 'inscription_style', i.inscription_style_id, COUNT(*)
+        FROM {item_table} i
+        JOIN {sources['inscription_style']} f ON f.id = i.id
+        WHERE i.inscription_style_id IS NOT NULL
+        GROUP BY i.inscription_style_id
+    ''')
+    # an item counts once per location even when it is the provenance, provenience and findspot
+    selects.append(f'''
+        SELECT 'location', l.location_id, COUNT(DISTINCT l.item_id)
+        FROM {item_table} i
+        JOIN {sources['location']} f ON f.id = i.id
+        CROSS JOIN LATERAL (VALUES (i.id, i.provenance_id), (i.id, i.provenience_id), (i.id, i.findspot_id)) AS l(item_id, location_id)
+        WHERE l.location_id IS NOT NULL
+        GROUP BY l.location_id
+    ''')
+    # matches the period filter (both ends known and the period within the range)
+    selects.append(f'''
+        SELECT 'period', p.period, COUNT(*)
+        FROM {item_table} i
+        JOIN {sources['period']} f ON f.id = i.id
+        CROSS JOIN LATERAL generate_series(i.earliest_creation, i.latest_creation) AS p(period)
+        WHERE i.earliest_creation IS NOT NULL AND i.latest_creation IS NOT NULL
+        GROUP BY p.period
+    ''')
+
+    sql = 'WITH ' + ', '.join(f'{name} AS MATERIALIZED ({cte_sql})' for name, cte_sql in ctes.items()) + ' ' + ' UNION ALL '.join(selects)
+    facet_counts = {facet: {} for facet in FACET_NAMES}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for facet, value, count in cursor.fetchall():
+            facet_counts[facet][value] = count
+    return facet_counts
@@ -1,87 +1,176 @@
 from django import forms
-from django_select2.forms import Select2Widget
+from django.urls import reverse_lazy
+from django_select2.forms import Select2MultipleWidget, Select2Widget
 
 from .models import Category, Culture, InscriptionStyle, Language, \
     Location, Technique, Item, Material, Subject
 
+class FacetModelMultipleChoiceField(forms.ModelMultipleChoiceField):
+    facet_counts = None
+
+    def label_from_instance(self, obj):
+        label = super().label_from_instance(obj)
+        if self.facet_counts is not None:
+            return f'{label} ({self.facet_counts.get(obj.pk, 0)})'
+        return label
+
 class ItemSearchForm(forms.Form):
     q = forms.CharField(
         widget=forms.TextInput(attrs={
             'type': 'search',
             'placeholder': 'Search...',
             'class': 'form-control',
+            'autocomplete': 'off',
+            'data-suggest-url': reverse_lazy('suggest'),
         }),
         required=False,
     )
-    category = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    category = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Category',
         }),
         queryset=Category.objects.order_by('label'),
         required=False,
     )
-    culture = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    culture = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Culture',
         }),
         queryset=Culture.objects.order_by('label'),
         required=False,
     )
-    inscription_style = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    inscription_style = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Inscription style',
         }),
         queryset=InscriptionStyle.objects.order_by('label'),
         required=False,
     )
-    language = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    language = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Language',
         }),
         queryset=Language.objects.order_by('label'),
         required=False,
     )
-    technique = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    technique = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Technique',
         }),
         queryset=Technique.objects.order_by('label'),
         required=False,
     )
-    period = forms.ChoiceField(
-        widget=Select2Widget(attrs={
+    period = forms.TypedMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Period',
         }),
-        choices=Item.Periods,
+        choices=[(value, label) for value, label in Item.Periods.choices if value is not None],
+        coerce=int,
         required=False,
     )
-    material = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    period_from = forms.TypedChoiceField(
+        widget=forms.Select(attrs={
+            'title': 'Created during or after',
+        }),
+        choices=[('', 'From century')] + [(value, label) for value, label in Item.Periods.choices if value is not None],
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+    period_to = forms.TypedChoiceField(
+        widget=forms.Select(attrs={
+            'title': 'Created during or before',
+        }),
+        choices=[('', 'To century')] + [(value, label) for value, label in Item.Periods.choices if value is not None],
+        coerce=int,
+        empty_value=None,
+        required=False,
+    )
+    material = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Material',
         }),
         queryset=Material.objects.order_by('label'),
         required=False,
     )
-    subject = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    subject = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Subject',
         }),
         queryset=Subject.objects.order_by('label'),
         required=False,
     )
-    location = forms.ModelChoiceField(
-        widget=Select2Widget(attrs={
+    location = FacetModelMultipleChoiceField(
+        widget=Select2MultipleWidget(attrs={
             'data-theme': 'bootstrap-5',
             'data-placeholder': 'Location',
         }),
         queryset=Location.objects.order_by('label'),
         required=False,
-    )
\ No newline at end of file
+    )
+    near = forms.ModelChoiceField(
+        widget=Select2Widget(attrs={
+            'data-theme': 'bootstrap-5',
+            'data-placeholder': 'Near location',
+            'data-allow-clear': 'true',
+        }),
+        queryset=Location.objects.filter(geom_point__isnull=False).order_by('label'),
+        required=False,
+    )
+    within = forms.IntegerField(
+        widget=forms.NumberInput(attrs={
+            'placeholder': 'Within km (default nearest)',
+            'title': 'Distance from the location in kilometres, leave empty for the nearest locations',
+        }),
+        min_value=1,
+        max_value=20000,
+        required=False,
+    )
+    spelling = forms.ChoiceField(
+        widget=forms.Select(attrs={
+            'title': 'How search words are matched',
+        }),
+        choices=[
+            ('similar', 'Include similar spellings'),
+            ('exact', 'Exact words only'),
+        ],
+        required=False,
+    )
+    match = forms.ChoiceField(
+        widget=forms.Select(attrs={
+            'title': 'How multiple values of the same filter are combined',
+        }),
+        choices=[
+            ('any', 'Match any selected value'),
+            ('all', 'Match all selected values'),
+        ],
+        required=False,
+    )
+
+    def __init__(self, *args, facet_counts=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # show the number of matching items next to each option
+        if facet_counts is not None:
+            for name, counts in facet_counts.items():
+                field = self.fields[name]
+                if isinstance(field, FacetModelMultipleChoiceField):
+                    field.facet_counts = counts
+            self.fields['period'].choices = [
+                (value, f'{label} ({facet_counts["period"].get(value, 0)})')
+                for value, label in self.fields['period'].choices
+            ]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        period_from, period_to = cleaned_data.get('period_from'), cleaned_data.get('period_to')
+        if period_from is not None and period_to is not None and period_from > period_to:
+            cleaned_data['period_from'], cleaned_data['period_to'] = period_to, period_from
+        return cleaned_data
@@ -0,0 +1,104 @@
+from math import ceil
+import re
+
+from PIL import Image as PILImage
+
+from .derivatives import open_source_image, save_image, IIIF_QUALITY
+
+IIIF_CONTEXT = 'http://iiif.io/api/image/3/context.json'
+IIIF_CONTENT_TYPE = f'application/ld+json;profile="{IIIF_CONTEXT}"'
+REGION_RE = re.compile(r'^(\d+),(\d+),(\d+),(\d+)$')
+SIZE_RE = re.compile(r'^(!)?(\d*),(\d*)$')
+
+class IIIFRequestError(ValueError):
+    pass
+
+def get_info(image, base_url):
+    """
+    IIIF Image API 3 `info.json` of an image with a current tile pyramid (see `Image.tiles`).
+    """
+    tiles = image.tiles
+    return {
+        '@context': IIIF_CONTEXT,
+        'id': base_url,
+        'type': 'ImageService3',
+        'protocol': 'http://iiif.io/api/image',
+        'profile': 'level1',
+        'width': tiles['width'],
+        'height': tiles['height'],
+        # larger images would be rendered from the source image on every request
+        'maxWidth': tiles['tile_size'],
+        'maxHeight': tiles['tile_size'],
+        'sizes': tiles['sizes'],
+        'tiles': [{'width': tiles['tile_size'], 'scaleFactors': tiles['scale_factors']}],
+    }
+
+def parse_region(region, width, height):
+    # returns the (x, y, w, h) box, cropped to the image
+    if region == 'full':
+        return 0, 0, width, height
+    if region == 'square':
+        side = min(width, height)
+        return (width - side) // 2, (height - side) // 2, side, side
+    match = REGION_RE.match(region)
+    if not match:
+        raise IIIFRequestError(f'Unsupported region: {region}')
+    x, y, w, h = (int(value) for value in match.groups())
+    if w == 0 or h == 0 or x >= width or y >= height:
+        raise IIIFRequestError(f'Invalid region: {region}')
+    return x, y, min(w, width - x), min(h, height - y)
+
+def parse_size(size, region_width, region_height, max_size):
+    # upscaling (`^`) is not supported, `max` is confined to `max_size`
+    if size == 'max':
+        scale = min(1, max_size / region_width, max_size / region_height)
+        return max(1, round(region_width * scale)), max(1, round(region_height * scale))
+    match = SIZE_RE.match(size)
+    if not match or not (match.group(2) or match.group(3)):
+        raise IIIFRequestError(f'Unsupported size: {size}')
+    confined, w, h = match.groups()
+    if confined:
+        if not (w and h):
+            raise IIIFRequestError(f'Invalid size: {size}')
+        scale = min(int(w) / region_width, int(h) / region_height)
+        w, h = round(region_width * scale), round(region_height * scale)
+    elif not h:
+        w = int(w)
+        h = round(region_height * w / region_width)
+    elif not w:
+        h = int(h)
+        w = round(region_width * h / region_height)
+    else:
+        w, h = int(w), int(h)
+    if w <= 0 or h <= 0:
+        raise IIIFRequestError(f'Invalid size: {size}')
+    if w > region_width or h > region_height:
+        raise IIIFRequestError(f'Upscaling is not supported: {size}')
+    if w > max_size or h > max_size:
+        raise IIIFRequestError(f'Size larger than {max_size}px: {size}')
+    return w, h
+
+def parse_request(image, region, size, rotation, quality, image_format):
+    """
+    Returns the `(x, y, w, h)` region and `(w, h)` size of an Image API request,
+    raises `IIIFRequestError` for requests outside level 1.
+    """
+    if rotation != '0':
+        raise IIIFRequestError(f'Unsupported rotation: {rotation}')
+    if quality != 'default':
+        raise IIIFRequestError(f'Unsupported quality: {quality}')
+    if image_format != 'jpg':
+        raise IIIFRequestError(f'Unsupported format: {image_format}')
+    box = parse_region(region, image.tiles['width'], image.tiles['height'])
+    return box, parse_size(size, box[2], box[3], image.tiles['tile_size'])
+
+def render_image(image, box, size):
+    # fallback for requests missing from the tile pyramid, JPEG sources are only decoded at the scale needed
+    x, y, w, h = box
+    side = ceil(max(image.tiles['width'], image.tiles['height']) * max(size[0] / w, size[1] / h))
+    source = open_source_image(image.image, draft_size=(side, side))
+    ratio = source.width / image.tiles['width']
+    source = source.crop((round(x * ratio), round(y * ratio), round((x + w) * ratio), round((y + h) * ratio)))
+    if source.size != size:
+        source = source.resize(size, PILImage.Resampling.LANCZOS, reducing_gap=3.0)
+    return save_image(source, 'JPEG', quality=IIIF_QUALITY)
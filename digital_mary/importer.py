@@ -0,0 +1,176 @@
+import csv
+import json
+import re
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.fields.json import KT
+
+from .models import html_to_text, Category, Culture, InscriptionStyle, Language, Location, \
+    Material, Subject, Technique, Item, RemoteImage, Person, Contribution
+from .marc_relators import MarcRelator
+from .export import TERM_FIELDS, LOCATION_FIELDS, CSV_LIST_SEPARATOR
+from .display_cache import refresh_display_cache
+from .search import refresh_search_documents
+from .caching import bump_content_versions, GLOBAL_CONTENT_VERSION
+
+IMPORT_FORMATS = ['csv', 'jsonl', 'json']
+# record field => term model (m2m fields take a list of labels, the others a single label)
+TERM_FIELD_MODELS = {
+    'categories': Category,
+    'cultures': Culture,
+    'languages': Language,
+    'materials': Material,
+    'techniques': Technique,
+    'subjects': Subject,
+    'inscription_style': InscriptionStyle,
+    'provenance': Location,
+    'provenience': Location,
+    'findspot': Location,
+}
+ITEM_TEXT_FIELDS = ['name', 'description', 'inscription', 'translated_inscription', 'dimensions', 'display_date']
+MARC_RELATOR_CODES = {label.lower(): code for code, label in MarcRelator.choices} | {code: code for code in MarcRelator.values}
+CSV_CONTRIBUTOR_RE = re.compile(r'^(?P<name>.*?)(?: \((?P<roles>[^()]*)\))?$')
+
+def read_records(file, import_format):
+    """
+    Reads records in the `export_items` layout (csv list columns are joined with `CSV_LIST_SEPARATOR`).
+    """
+    if import_format == 'json':
+        yield from json.load(file)
+    elif import_format == 'jsonl':
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+    elif import_format == 'csv':
+        for row in csv.DictReader(file):
+            yield parse_csv_row(row)
+    else:
+        raise ValueError(f'Unknown import format: {import_format}')
+
+def parse_csv_row(row):
+    def split(value):
+        return [part.strip() for part in (value or '').split(CSV_LIST_SEPARATOR.strip()) if part.strip()]
+
+    record = {key: value or None for key, value in row.items()}
+    for field_name in TERM_FIELDS + ['remote_images']:
+        record[field_name] = split(row.get(field_name))
+    record['contributors'] = []
+    for contributor in split(row.get('contributors')):
+        match = CSV_CONTRIBUTOR_RE.match(contributor)
+        record['contributors'].append({
+            'name': match.group('name'),
+            'roles': [role.strip() for role in (match.group('roles') or '').split(',') if role.strip()],
+        })
+    return record
+
+def parse_period(value):
+    if value in (None, ''):
+        return None
+    period = int(value)
+    return period if period in Item.Periods.values else None
+
+def resolve_terms(model, labels):
+    """
+    Returns `{label: pk}` for the labels (matching the English or Arabic label), creating the missing terms.
+    """
+    labels = {label for label in labels if label}
+    resolved = {}
+    for pk, label, label_ar in model.objects \
+            .alias(label_ar_text=KT('i18n__label_ar')) \
+            .filter(Q(label__in=labels) | Q(label_ar_text__in=labels)) \
+            .values_list('pk', 'label', KT('i18n__label_ar')):
+        resolved.setdefault(label, pk)
+        if label_ar:
+            resolved.setdefault(label_ar, pk)
+    missing = sorted(labels - resolved.keys())
+    resolved.update({term.label: term.pk for term in model.objects.bulk_create([model(label=label) for label in missing])})
+    return resolved
+
+def resolve_people(names):
+    names = {name for name in names if name}
+    resolved = dict(Person.objects.filter(fullname__in=names).values_list('fullname', 'pk'))
+    missing = sorted(names - resolved.keys())
+    resolved.update({person.fullname: person.pk for person in Person.objects.bulk_create([Person(fullname=name) for name in missing])})
+    return resolved
+
+def import_batch(records, is_public):
+    # terms and people are resolved with one query per model for the whole batch
+    term_ids = {}
+    for model in set(TERM_FIELD_MODELS.values()):
+        labels = set()
+        for field_name, field_model in TERM_FIELD_MODELS.items():
+            if field_model is model:
+                for record in records:
+                    value = record.get(field_name)
+                    labels.update(value if isinstance(value, list) else [value])
+        term_ids[model] = resolve_terms(model, labels)
+    person_ids = resolve_people(contributor['name'] for record in records for contributor in record.get('contributors') or [])
+
+    items = []
+    for record in records:
+        item = Item(
+            **{field_name: record.get(field_name) for field_name in ITEM_TEXT_FIELDS},
+            is_public=is_public,
+            earliest_creation=parse_period(record.get('earliest_creation')),
+            latest_creation=parse_period(record.get('latest_creation')),
+            # `bulk_create` skips `Item.save`
+            snippet_text=html_to_text(record.get('description'), record.get('translated_inscription')),
+        )
+        # exports write the label computed from the periods when there is no manual display date
+        if item.display_date == str(item.get_display_periods()):
+            item.display_date = None
+        if record.get('name_ar'):
+            item.name_ar = record.get('name_ar')
+        for field_name in ['inscription_style'] + LOCATION_FIELDS:
+            setattr(item, f'{field_name}_id', term_ids[TERM_FIELD_MODELS[field_name]].get(record.get(field_name)))
+        items.append(item)
+    items = Item.objects.bulk_create(items)
+
+    for field_name in TERM_FIELDS:
+        field = Item._meta.get_field(field_name)
+        through = field.remote_field.through
+        through.objects.bulk_create([
+            through(**{f'{field.m2m_field_name()}_id': item.pk, f'{field.m2m_reverse_field_name()}_id': term_ids[field.related_model][label]})
+            for item, record in zip(items, records)
+            # empty labels are skipped like empty foreign keys (see `resolve_terms`)
+            for label in set(record.get(field_name) or []) if label
+        ], ignore_conflicts=True)
+
+    Contribution.objects.bulk_create([
+        Contribution(
+            item_id=item.pk,
+            person_id=person_ids[contributor['name']],
+            marc_relators=[MARC_RELATOR_CODES[role.lower()] for role in contributor.get('roles') or [] if role.lower() in MARC_RELATOR_CODES],
+        )
+        for item, record in zip(items, records)
+        for contributor in record.get('contributors') or [] if contributor.get('name')
+    ])
+    RemoteImage.objects.bulk_create([
+        RemoteImage(item_id=item.pk, url=url, order=order)
+        for item, record in zip(items, records)
+        for order, url in enumerate(record.get('remote_images') or [])
+    ])
+    return [item.pk for item in items]
+
+@transaction.atomic
+def import_items(records, batch_size=2000, is_public=True):
+    """
+    Bulk imports item records (terms and people are matched by label/name or created) in one transaction.
+
+    Model signals are bypassed so the display cache, search documents and content version are refreshed once at the end.
+    """
+    item_ids = []
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            item_ids += import_batch(batch, is_public)
+            batch = []
+    if batch:
+        item_ids += import_batch(batch, is_public)
+
+    refresh_display_cache(item_ids)
+    refresh_search_documents(item_ids)
+    bump_content_versions([GLOBAL_CONTENT_VERSION])
+    return item_ids
@@ -0,0 +1,87 @@
+from datetime import timedelta
+import logging
+import traceback
+
+from django.apps import apps
+from django.db import transaction
+from django.utils import timezone
+
+from .models import DerivativeJob
+from .derivatives import DerivativesMixin
+
+logger = logging.getLogger(__name__)
+
+# a claimed job is retried after the lease if the worker died
+JOB_LEASE = timedelta(minutes=15)
+JOB_RETRY_DELAY = timedelta(minutes=1)
+MAX_JOB_ATTEMPTS = 5
+
+def get_derivative_models():
+    return [model for model in apps.get_models() if issubclass(model, DerivativesMixin)]
+
+def queue_derivatives(instances):
+    """
+    Queues derivative generation for the instances once the transaction commits
+    (queuing an object again resets its attempts and reruns a running job).
+    """
+    keys = {(instance._meta.label_lower, instance.pk) for instance in instances if instance.pk}
+    if keys:
+        transaction.on_commit(lambda: _create_jobs(keys))
+
+def _create_jobs(keys):
+    now = timezone.now()
+    DerivativeJob.objects.bulk_create(
+        [DerivativeJob(model=model, object_id=object_id, requested=now, available=now) for model, object_id in keys],
+        update_conflicts=True,
+        unique_fields=['model', 'object_id'],
+        update_fields=['requested', 'available', 'attempts', 'error'],
+    )
+
+def queue_missing_derivatives():
+    instances = []
+    for model in get_derivative_models():
+        instances += [instance for instance in model.objects.iterator() if instance.has_stale_derivatives()]
+    queue_derivatives(instances)
+    return len(instances)
+
+@transaction.atomic
+def claim_job():
+    # `skip_locked` lets several workers run side by side
+    now = timezone.now()
+    job = DerivativeJob.objects \
+        .select_for_update(skip_locked=True) \
+        .filter(available__lte=now, attempts__lt=MAX_JOB_ATTEMPTS) \
+        .order_by('available') \
+        .first()
+    if job is not None:
+        job.available = now + JOB_LEASE
+        job.attempts += 1
+        job.save(update_fields=['available', 'attempts'])
+    return job
+
+def run_job(job):
+    # the object may have been deleted since
+    model = apps.get_model(job.model)
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is not None:
+        instance.generate_derivatives()
+
+def process_next_job():
+    """
+    Claims and runs one available job, returns it with `error` set on failure (or `None` when the queue is empty).
+    """
+    job = claim_job()
+    if job is None:
+        return None
+    # rows are only changed if the job was not queued again meanwhile
+    pending = DerivativeJob.objects.filter(pk=job.pk, requested=job.requested)
+    try:
+        run_job(job)
+    except Exception:
+        logger.exception('Derivative job %s failed', job)
+        job.error = traceback.format_exc()
+        pending.update(error=job.error, available=timezone.now() + JOB_RETRY_DELAY * job.attempts)
+    else:
+        pending.delete()
+        job.error = None
+    return job
@@ -0,0 +1,215 @@
+from random import Random
+from statistics import median
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from digital_mary.display_cache import refresh_display_cache
+from digital_mary.search import refresh_search_documents, search_items
+from digital_mary.pagination import BROWSE_ORDERING, get_browse_annotations, encode_cursor
+from digital_mary.marc_relators import MarcRelator
+from digital_mary.models import html_to_text, Category, Culture, InscriptionStyle, Language, \
+    Location, Material, Subject, Technique, Item, Image, RemoteImage, Person, Contribution
+
+# maximum number of SQL queries allowed per view (must not depend on page size or item count)
+QUERY_BUDGETS = {
+    'home': 2,
+    'about': 4,
+    'items': 14,
+    'items_deep': 14,
+    'items_filtered': 20,
+    'item': 8,
+    'admin_items': 20,
+}
+
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+TERM_MODELS = [Category, Culture, InscriptionStyle, Language, Location, Material, Subject, Technique]
+TERMS_PER_MODEL = 25
+PERIODS = [period for period in Item.Periods.values if period is not None]
+
+class Command(BaseCommand):
+    help = 'Seeds a temporary catalogue and checks the SQL query budget and render time of the public and admin views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=3000, help='number of items to seed (default 3000)')
+        parser.add_argument('--repeat', type=int, default=5, help='number of timed renders per view (default 5)')
+        parser.add_argument('--seed', type=int, default=1, help='random seed for the fixture (default 1)')
+        parser.add_argument('--keep', action='store_true', help='keep the seeded fixture instead of rolling it back')
+
+    def handle(self, *args, **options):
+        # everything happens inside a transaction that is rolled back so the fixture never leaks into the database
+        with transaction.atomic():
+            fixture = self.seed(options['items'], Random(options['seed']))
+            results = self.run_views(fixture, options['repeat'])
+            search_plan = self.explain_search()
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+        self.stdout.write(f'{"view":<16}{"queries":>10}{"budget":>10}{"median ms":>12}{"min ms":>10}')
+        failures = []
+        for name, (query_count, timings) in results.items():
+            budget = QUERY_BUDGETS[name]
+            line = f'{name:<16}{query_count:>10}{budget:>10}{median(timings):>12.1f}{min(timings):>10.1f}'
+            if query_count > budget:
+                failures.append(f'{name} ran {query_count} queries (budget {budget})')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(self.style.SUCCESS(line))
+
+        if f'Seq Scan on {Item._meta.db_table}' in search_plan:
+            failures.append('fuzzy search scans the item table')
+            self.stdout.write(self.style.ERROR(search_plan))
+
+        if failures:
+            raise CommandError('Query budget exceeded: ' + '; '.join(failures))
+
+    def seed(self, item_count, random):
+        terms = {}
+        for model in TERM_MODELS:
+            objects = [
+                model(label=f'Benchmark {model._meta.verbose_name} {index}', description=f'<p>Benchmark {model._meta.verbose_name} {index}</p>')
+                for index in range(TERMS_PER_MODEL)
+            ]
+            if model is Location:
+                for location in objects:
+                    location.geom_point = Point(random.uniform(20, 45), random.uniform(25, 42), srid=4326)
+            terms[model] = model.objects.bulk_create(objects)
+
+        people = Person.objects.bulk_create([
+            Person(fullname=f'Benchmark Person {index}', citation_name=f'Person, Benchmark {index}')
+            for index in range(50)
+        ])
+
+        items = []
+        for index in range(item_count):
+            earliest_creation = random.choice([None] + PERIODS)
+            latest_creation = random.choice([None] + [period for period in PERIODS if earliest_creation is None or period >= earliest_creation])
+            description = f'<p>Benchmark description for item {index} of the Virgin Mary.</p>' * 5
+            translated_inscription = '<p>Mother of God</p>'
+            items.append(Item(
+                name=f'Benchmark Item {index}',
+                description=description,
+                inscription='ΜΗΡ ΘΥ',
+                translated_inscription=translated_inscription,
+                # `bulk_create` skips `Item.save`
+                snippet_text=html_to_text(description, translated_inscription),
+                earliest_creation=earliest_creation,
+                latest_creation=latest_creation,
+                inscription_style=random.choice(terms[InscriptionStyle]),
+                provenance=random.choice(terms[Location]),
+                provenience=random.choice(terms[Location]),
+                findspot=random.choice(terms[Location]),
+            ))
+        items = Item.objects.bulk_create(items, batch_size=1000)
+
+        for field_name, model in [('categories', Category), ('cultures', Culture), ('languages', Language),
+                                  ('materials', Material), ('subjects', Subject), ('techniques', Technique)]:
+            through = getattr(Item, field_name).through
+            term_field = f'{model._meta.model_name}_id'
+            through.objects.bulk_create([
+                through(item_id=item.pk, **{term_field: term.pk})
+                for item in items
+                for term in random.sample(terms[model], random.randint(1, 3))
+            ], batch_size=5000)
+
+        # image files are never read by the views so the fixture only needs file names
+        Image.objects.bulk_create([
+            Image(
+                item=item,
+                name=f'Benchmark Image {index}',
+                is_public=index % 3 != 2,
+                image='images/benchmark.jpg',
+                image_width=2000,
+                image_height=1500,
+                thumbnail='thumbnails/benchmark.jpg',
+                description='<p>Benchmark image</p>',
+                order=index,
+            )
+            for item in items
+            for index in range(random.randint(0, 4))
+        ], batch_size=5000)
+        RemoteImage.objects.bulk_create([
+            RemoteImage(item=item, name='Benchmark Remote Image', url='https://www.britishmuseum.org/collection/object/benchmark')
+            for item in items[::3]
+        ], batch_size=5000)
+        Contribution.objects.bulk_create([
+            Contribution(item=item, person=person, marc_relators=[MarcRelator.AUT, MarcRelator.EDT])
+            for item in items
+            for person in random.sample(people, 2)
+        ], batch_size=5000)
+
+        # bulk_create skips the signals that maintain the display cache
+        refresh_display_cache([item.pk for item in items])
+        refresh_search_documents([item.pk for item in items])
+
+        # a previous run with `--keep` left its user
+        user, _ = get_user_model().objects.get_or_create(username='benchmark', defaults={
+            'email': 'benchmark@example.com',
+            'is_staff': True,
+            'is_superuser': True,
+        })
+
+        return {
+            'item': items[0],
+            'items': items,
+            'category': terms[Category][0],
+            'material': terms[Material][0],
+            'user': user,
+        }
+
+    def run_views(self, fixture, repeat):
+        item = fixture['item']
+        cursor_item = Item.objects.annotate(**get_browse_annotations()).filter(is_public=True).order_by(*BROWSE_ORDERING)[len(fixture['items']) // 2]
+        requests = {
+            'home': (reverse('home'), False),
+            'about': (reverse('about'), False),
+            'items': (reverse('items') + '?page=2', False),
+            'items_deep': (reverse('items') + f'?cursor={encode_cursor(cursor_item)}', False),
+            'items_filtered': (reverse('items') + f'?q=mary&category={fixture["category"].pk}&material={fixture["material"].pk}&period=6', False),
+            'item': (reverse('item', kwargs={'pk': item.pk}), False),
+            'admin_items': (reverse('admin:digital_mary_item_changelist'), True),
+        }
+
+        anonymous_client = Client()
+        admin_client = Client()
+        admin_client.force_login(fixture['user'])
+
+        results = {}
+        # no cache at all (responses, fragments, facet counts, ranked ids, snippets) so every request is a full render
+        with override_settings(ALLOWED_HOSTS=['testserver'], CACHE_SECONDS=0, CACHES=BENCHMARK_CACHES):
+            for name, (url, is_admin) in requests.items():
+                client = admin_client if is_admin else anonymous_client
+                # warm up (content types, template loaders) before counting
+                self.get(client, url)
+                with CaptureQueriesContext(connection) as queries:
+                    self.get(client, url)
+                timings = []
+                for _ in range(repeat):
+                    start = perf_counter()
+                    self.get(client, url)
+                    timings.append((perf_counter() - start) * 1000)
+                results[name] = (len(queries), timings)
+        return results
+
+    def explain_search(self):
+        # the fixture is small enough for a scan to win, a scan despite `enable_seqscan = off` means a search branch has no index
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = search_items(Item.objects.all(), 'mary').explain()
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = on')
+        return plan
+
+    def get(self, client, url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise CommandError(f'{url} returned status {response.status_code}')
+        return response
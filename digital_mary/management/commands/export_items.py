@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from digital_mary.export import stream_export, EXPORT_FORMATS
+
+class Command(BaseCommand):
+    help = 'Exports every public item as csv, json lines or json-ld (streamed in constant memory)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=list(EXPORT_FORMATS.keys()), default='jsonl', help='export format (default jsonl)')
+        parser.add_argument('--output', help='file to write (default stdout)')
+        parser.add_argument('--base-url', default='', help='prefix of item and image urls (e.g. https://example.com)')
+
+    def handle(self, *args, **options):
+        chunks = stream_export(options['format'], options['base_url'].rstrip('/'))
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+                output.writelines(chunks)
+            self.stdout.write(self.style.SUCCESS(f'Exported public items to {options["output"]}'))
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,25 @@
+import os
+from time import perf_counter
+
+from django.core.management.base import BaseCommand, CommandError
+
+from digital_mary.importer import import_items, read_records, IMPORT_FORMATS
+
+class Command(BaseCommand):
+    help = 'Bulk imports items with their terms, contributors and remote images from csv, json lines or json (the export_items layout)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='file to import')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='import format (default from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=2000, help='records per bulk insert batch (default 2000)')
+        parser.add_argument('--private', action='store_true', help='import the items as not public')
+
+    def handle(self, *args, **options):
+        import_format = options['format'] or os.path.splitext(options['file'])[1].lstrip('.').lower()
+        if import_format not in IMPORT_FORMATS:
+            raise CommandError(f'Unknown import format "{import_format}", use --format')
+
+        start = perf_counter()
+        with open(options['file'], encoding='utf-8-sig', newline='') as file:
+            item_ids = import_items(read_records(file, import_format), batch_size=options['batch_size'], is_public=not options['private'])
+        self.stdout.write(self.style.SUCCESS(f'Imported {len(item_ids)} items in {perf_counter() - start:.1f}s'))
@@ -0,0 +1,28 @@
+from time import sleep
+
+from django.core.management.base import BaseCommand
+
+from digital_mary.jobs import process_next_job, queue_missing_derivatives
+
+class Command(BaseCommand):
+    help = 'Runs the background jobs (image derivatives) queued after admin saves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='exit once the queue is empty instead of polling')
+        parser.add_argument('--sleep', type=float, default=5, help='seconds to wait between polls of an empty queue')
+        parser.add_argument('--queue-missing', action='store_true', help='first queue the images without derivatives')
+
+    def handle(self, *args, **options):
+        if options['queue_missing']:
+            count = queue_missing_derivatives()
+            self.stdout.write(f'Queued derivatives for {count} images')
+        while True:
+            job = process_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                sleep(options['sleep'])
+            elif job.error:
+                self.stderr.write(self.style.ERROR(f'Failed {job} (attempt {job.attempts})'))
+            elif options['verbosity'] > 1:
+                self.stdout.write(f'Processed {job}')
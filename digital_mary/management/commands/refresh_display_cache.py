@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from digital_mary.models import Item
+from digital_mary.display_cache import refresh_display_cache
+from digital_mary.search import refresh_search_documents
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized item display cache and search documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing', action='store_true', help='only rebuild items without a display cache or search document')
+
+    def handle(self, *args, **options):
+        queryset = Item.objects.all()
+        if options['missing']:
+            queryset = queryset.filter(Q(display_cache={}) | Q(search_document__isnull=True) | Q(term_labels__isnull=True))
+        item_ids = list(queryset.values_list('pk', flat=True))
+        refresh_display_cache(item_ids)
+        refresh_search_documents(item_ids)
+        self.stdout.write(self.style.SUCCESS(f'Refreshed the display cache and search document of {len(item_ids)} items'))
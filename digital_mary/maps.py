@@ -0,0 +1,198 @@
+from math import isfinite
+
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance, GeometryDistance
+from django.contrib.gis.measure import D
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+
+from .models import Item, Location
+
+# points closer than 1/CLUSTER_GRID of a tile are clustered, up to CLUSTER_MAX_ZOOM
+CLUSTER_GRID = 8
+CLUSTER_MAX_ZOOM = 14
+MAX_ZOOM = 22
+TILE_EXTENT = 4096
+TILE_LAYER = 'locations'
+# nearby searches only look at the items of the nearest locations
+NEARBY_LOCATION_LIMIT = 25
+NEARBY_ITEM_LIMIT = 12
+LOCATION_FIELDS = ['findspot', 'provenience', 'provenance']
+# matches the `location_geom_idx` expression index (geography bbox tests break for boxes wider than a hemisphere)
+GEOMETRY_SQL = 'loc.geom_point::geometry(Point,4326)'
+
+def _located_items_sql(bounds_sql):
+    """
+    Locations inside the bounds (geometry index) with the number of public items linked as provenance,
+    provenience or findspot (each counted once, using the foreign key indexes).
+    """
+    location_table = Location._meta.db_table
+    item_table = Item._meta.db_table
+    return f'''
+        SELECT loc.id, loc.label, {GEOMETRY_SQL} AS geom, counts.item_count
+        FROM {location_table} loc
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS item_count
+            FROM {item_table} i
+            WHERE i.is_public AND (i.provenance_id = loc.id OR i.provenience_id = loc.id OR i.findspot_id = loc.id)
+        ) counts
+        WHERE {GEOMETRY_SQL} && {bounds_sql} AND counts.item_count > 0
+    '''
+
+def _cluster_sql(cluster_size):
+    # every location is its own feature once zoomed in
+    return 'ST_SnapToGrid(geom, %(cluster_size)s)' if cluster_size else 'id'
+
+def is_valid_bbox(bbox):
+    # `west > east` crosses the antimeridian
+    if len(bbox) != 4 or not all(isfinite(value) for value in bbox):
+        return False
+    west, south, east, north = bbox
+    return -180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90
+
+def get_location_clusters(bbox, zoom):
+    """
+    Returns a GeoJSON feature collection of the located public items inside `bbox` (west, south, east, north),
+    clustered on a grid that shrinks with the zoom level. Boxes crossing the antimeridian (`west > east`)
+    are split in two.
+    """
+    west, south, east, north = bbox
+    if west > east:
+        features = _query_location_clusters((west, south, 180, north), zoom) + _query_location_clusters((-180, south, east, north), zoom)
+    else:
+        features = _query_location_clusters(bbox, zoom)
+    return {'type': 'FeatureCollection', 'features': features}
+
+def _query_location_clusters(bbox, zoom):
+    cluster_size = 360 / (2 ** zoom) / CLUSTER_GRID if zoom < CLUSTER_MAX_ZOOM else 0
+    sql = f'''
+        WITH points AS ({_located_items_sql('ST_MakeEnvelope(%(west)s, %(south)s, %(east)s, %(north)s, 4326)')})
+        SELECT COUNT(*), SUM(item_count), MIN(id), MIN(label),
+            ST_X(ST_Centroid(ST_Collect(geom))), ST_Y(ST_Centroid(ST_Collect(geom)))
+        FROM points
+        GROUP BY {_cluster_sql(cluster_size)}
+    '''
+    west, south, east, north = bbox
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'west': west, 'south': south, 'east': east, 'north': north, 'cluster_size': cluster_size})
+        rows = cursor.fetchall()
+    return [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [x, y]},
+            'properties': {
+                'location_count': location_count,
+                'item_count': int(item_count),
+                # single locations can link to their items
+                'location': {'id': location_id, 'label': label} if location_count == 1 else None,
+            },
+        }
+        for location_count, item_count, location_id, label, x, y in rows
+    ]
+
+def _query_tile(z, x, y):
+    cluster_size = TILE_EXTENT // CLUSTER_GRID if z < CLUSTER_MAX_ZOOM else 0
+    sql = f'''
+        WITH bounds AS (SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS geom),
+        points AS ({_located_items_sql('ST_Transform((SELECT geom FROM bounds), 4326)')}),
+        tile_points AS (
+            SELECT points.id, points.label, points.item_count,
+                ST_AsMVTGeom(ST_Transform(points.geom, 3857), bounds.geom, %(extent)s) AS geom
+            FROM points, bounds
+        ),
+        clusters AS (
+            SELECT COUNT(*) AS location_count, SUM(item_count)::int AS item_count,
+                CASE WHEN COUNT(*) = 1 THEN MIN(id) END AS location_id,
+                CASE WHEN COUNT(*) = 1 THEN MIN(label) END AS label,
+                ST_Centroid(ST_Collect(geom)) AS geom
+            FROM tile_points
+            WHERE geom IS NOT NULL
+            GROUP BY {_cluster_sql(cluster_size)}
+        )
+        SELECT ST_AsMVT(clusters, %(layer)s, %(extent)s, 'geom') FROM clusters
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'z': z, 'x': x, 'y': y, 'extent': TILE_EXTENT, 'cluster_size': cluster_size, 'layer': TILE_LAYER})
+        tile = cursor.fetchone()[0]
+    return bytes(tile) if tile else b''
+
+def is_valid_tile(z, x, y):
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+def get_tile(z, x, y, content_version):
+    """
+    Returns the Mapbox Vector Tile of the (clustered) located public items, cached per tile and content version.
+    """
+    cache_key = f'map_tile:{content_version}:{z}:{x}:{y}'
+    tile = cache.get(cache_key)
+    if tile is None:
+        tile = _query_tile(z, x, y)
+        cache.set(cache_key, tile, settings.CACHE_SECONDS)
+    return tile
+
+def get_nearest_locations(point):
+    """
+    Located locations ordered by distance to the point (`<->` KNN on the geography index, slice before use).
+    """
+    return Location.objects \
+        .filter(geom_point__isnull=False) \
+        .order_by(GeometryDistance('geom_point', point))
+
+def filter_items_near(queryset, location, within_km=None):
+    """
+    Filters items linked (findspot, provenience or provenance) to a location within `within_km` of the location
+    (`ST_DWithin` on the geography index) or, without a radius, to one of its nearest located locations.
+    """
+    if within_km is not None:
+        locations = Location.objects.filter(geom_point__dwithin=(location.geom_point, D(km=within_km))).values('pk')
+    else:
+        locations = get_nearest_locations(location.geom_point).values('pk')[:NEARBY_LOCATION_LIMIT]
+    return queryset.filter(Q(findspot__in=locations) | Q(provenience__in=locations) | Q(provenance__in=locations))
+
+def get_item_point(item):
+    for field_name in LOCATION_FIELDS:
+        location = getattr(item, field_name)
+        if location and location.geom_point:
+            return location.geom_point
+    return None
+
+def get_nearby_items(item, content_version):
+    """
+    Returns the public items nearest to the item (by its findspot, provenience or provenance) as
+    `[{pk, name, url, location, distance_km}]`, cached per item and content version.
+    """
+    cache_key = f'item_nearby:{content_version}:{item.pk}'
+    nearby_items = cache.get(cache_key)
+    if nearby_items is not None:
+        return nearby_items
+
+    nearby_items = []
+    point = get_item_point(item)
+    if point:
+        # distances are only computed for the nearest locations
+        nearest = get_nearest_locations(point).annotate(distance=Distance('geom_point', point))[:NEARBY_LOCATION_LIMIT]
+        locations = {location.pk: location for location in nearest}
+        location_ids = list(locations.keys())
+        candidates = Item.objects \
+            .filter(is_public=True) \
+            .exclude(pk=item.pk) \
+            .filter(Q(findspot__in=location_ids) | Q(provenience__in=location_ids) | Q(provenance__in=location_ids)) \
+            .values_list('pk', 'name', *[f'{field_name}_id' for field_name in LOCATION_FIELDS])
+        for pk, name, *location_ids in candidates:
+            # the closest of the item's linked locations
+            location = min(
+                (locations[location_id] for location_id in location_ids if location_id in locations),
+                key=lambda location: location.distance.m,
+            )
+            nearby_items.append({
+                'pk': pk,
+                'name': name,
+                'url': reverse('item', kwargs={'pk': pk}),
+                'location': location.label,
+                'distance_km': round(location.distance.km, 1),
+            })
+        nearby_items = sorted(nearby_items, key=lambda nearby_item: (nearby_item['distance_km'], nearby_item['name'], nearby_item['pk']))[:NEARBY_ITEM_LIMIT]
+    cache.set(cache_key, nearby_items, settings.CACHE_SECONDS)
+    return nearby_items
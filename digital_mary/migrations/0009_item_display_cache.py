@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0008_alter_image_options_alter_remoteimage_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='display_cache',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.3 on 2026-10-17 11:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0009_item_display_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContentVersion',
+            fields=[
+                ('key', models.CharField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'digital_mary_content_version',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 12:14
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0010_contentversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('earliest_creation', models.Value(99)), django.db.models.functions.comparison.Coalesce('latest_creation', models.Value(99)), models.F('name'), models.F('id'), condition=models.Q(('is_public', True)), name='item_browse_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 6.0.3 on 2026-10-17 13:05
+
+import digital_mary.models
+import django.contrib.postgres.indexes
+import django.db.models.fields.json
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0011_item_browse_idx'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunSQL(
+            sql="""
+                CREATE OR REPLACE FUNCTION digital_mary_immutable_array_to_string(anyarray, text) RETURNS text
+                LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$ SELECT array_to_string($1, $2) $$;
+            """,
+            reverse_sql="DROP FUNCTION IF EXISTS digital_mary_immutable_array_to_string(anyarray, text);",
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='category_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='category_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culture',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='culture_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culture',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='culture_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscriptionstyle',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='inscstyle_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscriptionstyle',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='inscstyle_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='language_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='language_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='location_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='location_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(digital_mary.models.AlternateNamesText('alternate_names'), name='gin_trgm_ops'), name='location_alt_names_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='material_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='material_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='subject_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='subject_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(digital_mary.models.AlternateNamesText('alternate_names'), name='gin_trgm_ops'), name='subject_alt_names_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technique',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('label'), name='gin_trgm_ops'), name='technique_label_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technique',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__label_ar'), name='gin_trgm_ops'), name='technique_label_ar_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('name'), name='gin_trgm_ops'), name='item_name_trgm_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.fields.json.KT('i18n__name_ar'), name='gin_trgm_ops'), name='item_name_ar_trgm_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0.3 on 2026-10-17 13:48
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0012_trigram_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='search_document',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_document'], name='digital_mar_search__2813fa_gin'),
+        ),
+    ]
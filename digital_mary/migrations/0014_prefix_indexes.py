@@ -0,0 +1,88 @@
+# Generated by Django 6.0.3 on 2026-10-17 14:21
+
+import django.contrib.postgres.indexes
+import django.db.models.fields.json
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0013_item_search_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='category_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='category_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culture',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='culture_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='culture',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='culture_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscriptionstyle',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='inscstyle_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inscriptionstyle',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='inscstyle_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='language_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='language',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='language_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='location_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='location_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='material_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='material',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='material_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='subject_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='subject_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technique',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('label')), name='text_pattern_ops'), name='technique_label_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technique',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__label_ar')), name='text_pattern_ops'), name='technique_label_ar_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(models.F('name')), name='text_pattern_ops'), name='item_name_prefix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=models.Index(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper(django.db.models.fields.json.KT('i18n__name_ar')), name='text_pattern_ops'), name='item_name_ar_prefix_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.3 on 2026-10-17 15:02
+
+from html import unescape
+
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+
+def html_to_text(*values):
+    return ' '.join(' '.join(unescape(strip_tags(value)).split()) for value in values if value).strip()
+
+def populate_snippet_text(apps, schema_editor):
+    Item = apps.get_model('digital_mary', 'Item')
+    items = list(Item.objects.only('description', 'translated_inscription', 'i18n'))
+    for item in items:
+        i18n = item.i18n or {}
+        item.snippet_text = html_to_text(item.description, item.translated_inscription)
+        item.snippet_text_ar = html_to_text(i18n.get('description_ar'), i18n.get('translated_inscription_ar'))
+    Item.objects.bulk_update(items, ['snippet_text', 'snippet_text_ar'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0014_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='snippet_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='snippet_text_ar',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_snippet_text, migrations.RunPython.noop),
+    ]
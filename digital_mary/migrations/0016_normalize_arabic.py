@@ -0,0 +1,32 @@
+# Generated by Django 6.0.3 on 2026-10-17 15:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0015_item_snippet_text'),
+    ]
+
+    operations = [
+        # folds hamza/alef variants, alef maksura and teh marbuta, removes diacritics (U+064B-U+0655, U+0670) and tatweel (U+0640)
+        migrations.RunSQL(
+            sql=r"""
+                CREATE OR REPLACE FUNCTION digital_mary_normalize_arabic(text) RETURNS text
+                LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+                    SELECT translate(
+                        $1,
+                        'آأإٱىؤئة' || U&'\064B\064C\064D\064E\064F\0650\0651\0652\0653\0654\0655\0670\0640',
+                        'اااايويه'
+                    )
+                $$;
+            """,
+            reverse_sql="DROP FUNCTION IF EXISTS digital_mary_normalize_arabic(text);",
+        ),
+        # rebuilt with normalized arabic text by `refresh_display_cache --missing`
+        migrations.RunSQL(
+            sql="UPDATE digital_mary_item SET search_document = NULL;",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
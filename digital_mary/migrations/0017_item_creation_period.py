@@ -0,0 +1,24 @@
+# Generated by Django 6.0.3 on 2026-10-17 16:12
+
+import django.contrib.postgres.fields.ranges
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0016_normalize_arabic'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='creation_period',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(models.Q(('earliest_creation__isnull', False), ('latest_creation__isnull', False), ('earliest_creation__lte', models.F('latest_creation'))), then=models.Func('earliest_creation', 'latest_creation', models.Value('[]'), function='int4range', output_field=django.contrib.postgres.fields.ranges.IntegerRangeField())), default=None, output_field=django.contrib.postgres.fields.ranges.IntegerRangeField()), output_field=django.contrib.postgres.fields.ranges.IntegerRangeField()),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['creation_period'], name='item_creation_period_idx'),
+        ),
+    ]
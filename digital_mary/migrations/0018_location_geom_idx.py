@@ -0,0 +1,20 @@
+# Generated by Django 6.0.3 on 2026-10-17 17:20
+
+import django.contrib.gis.db.models.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.comparison
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0017_item_creation_period'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=django.contrib.postgres.indexes.GistIndex(django.db.models.functions.comparison.Cast('geom_point', output_field=django.contrib.gis.db.models.fields.PointField(srid=4326)), name='location_geom_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.3 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0018_location_geom_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='thumbnails/'),
+        ),
+        migrations.CreateModel(
+            name='DerivativeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField()),
+                ('object_id', models.BigIntegerField()),
+                ('requested', models.DateTimeField()),
+                ('available', models.DateTimeField(db_index=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'digital_mary_derivative_job',
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id'), name='derivative_job_unique_object')],
+            },
+        ),
+    ]
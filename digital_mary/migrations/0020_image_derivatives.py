@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0019_derivative_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
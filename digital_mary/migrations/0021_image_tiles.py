@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0020_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='tiles',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
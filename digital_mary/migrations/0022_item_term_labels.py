@@ -0,0 +1,23 @@
+# Generated by Django 6.0.3 on 2026-10-18 10:12
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary', '0021_image_tiles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='term_labels',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='item',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(models.F('term_labels'), name='gin_trgm_ops'), name='item_term_labels_trgm_idx'),
+        ),
+    ]
@@ -1,15 +1,52 @@
 from django.db import models
-from django_advance_thumbnail import AdvanceThumbnailField
-from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.fields import ArrayField, IntegerRangeField
 from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.gis.db.models.fields import MultiPolygonField, PointField
-from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.indexes import GinIndex, GistIndex, OpClass
+from django.db.models.fields.json import KT
+from django.db.models.functions import Cast, Coalesce, Upper
+from django.utils.html import strip_tags
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
 from modeltrans.fields import TranslationField
 from html import unescape
 
 from .marc_relators import MarcRelator
+from .derivatives import DerivativesMixin, make_responsive_derivatives, make_tile_pyramid, IIIF_DIRECTORY
+
+def html_to_text(*values):
+    # plain text of TinyMCE html (ignores empty values)
+    return ' '.join(' '.join(unescape(strip_tags(value)).split()) for value in values if value).strip()
+
+# database functions
+class AlternateNamesText(models.Func):
+    # `array_to_string` is only stable so indexes use an immutable wrapper (created in migration 0012)
+    function = 'digital_mary_immutable_array_to_string'
+    template = "%(function)s(%(expressions)s, ' ')"
+    arity = 1
+    output_field = models.TextField()
+
+class NormalizeArabic(models.Func):
+    # see `search.ARABIC_NORMALIZATION` (created in migration 0016)
+    function = 'digital_mary_normalize_arabic'
+    arity = 1
+    output_field = models.TextField()
+
+def trigram_index(expression, name):
+    return GinIndex(OpClass(expression, name='gin_trgm_ops'), name=name)
+
+def prefix_index(expression, name):
+    # matches `istartswith` lookups (`UPPER(...) LIKE UPPER('prefix%')`)
+    return models.Index(OpClass(Upper(expression), name='text_pattern_ops'), name=name)
+
+def term_search_indexes(prefix):
+    # fuzzy search and suggestions on term labels (see `search.py`)
+    return [
+        trigram_index(models.F('label'), f'{prefix}_label_trgm_idx'),
+        trigram_index(KT('i18n__label_ar'), f'{prefix}_label_ar_trgm_idx'),
+        prefix_index(models.F('label'), f'{prefix}_label_prefix_idx'),
+        prefix_index(KT('i18n__label_ar'), f'{prefix}_label_ar_prefix_idx'),
+    ]
 
 # abstract Models
 class AbstractTerm(models.Model):
@@ -37,6 +74,7 @@ class Category(AbstractTerm):
         verbose_name_plural = 'categories'
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('category'),
         ]
 
 class Culture(AbstractTerm):
@@ -47,6 +85,7 @@ class Culture(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('culture'),
         ]
 
 class InscriptionStyle(AbstractTerm):
@@ -58,6 +97,7 @@ class InscriptionStyle(AbstractTerm):
         db_table = 'digital_mary_inscription_style'
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('inscstyle'),
         ]
 
 class Language(AbstractTerm):
@@ -68,6 +108,7 @@ class Language(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('language'),
         ]
 
 class Location(AbstractTerm):
@@ -90,6 +131,10 @@ class Location(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('location'),
+            trigram_index(AlternateNamesText('alternate_names'), 'location_alt_names_trgm_idx'),
+            # geometry bbox lookups of the map (see `maps.py`)
+            GistIndex(Cast('geom_point', PointField(srid=4326)), name='location_geom_idx'),
         ]
 
 class Material(AbstractTerm):
@@ -100,6 +145,7 @@ class Material(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('material'),
         ]
 
 class Subject(AbstractTerm):
@@ -118,6 +164,8 @@ class Subject(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('subject'),
+            trigram_index(AlternateNamesText('alternate_names'), 'subject_alt_names_trgm_idx'),
         ]
 
 
@@ -129,8 +177,12 @@ class Technique(AbstractTerm):
     class Meta:
         indexes = [
             GinIndex(fields=['i18n']),
+            *term_search_indexes('technique'),
         ]
 
+# unknown periods sort after the last century when browsing items
+UNKNOWN_PERIOD_ORDER = 99
+
 class Item(models.Model):
     class Periods(models.IntegerChoices):
         __empty__ = _('Unknown')
@@ -169,6 +221,20 @@ class Item(models.Model):
     earliest_creation = models.IntegerField(choices=Periods.choices, null=True, blank=True)
     latest_creation = models.IntegerField(choices=Periods.choices, null=True, blank=True)
 
+    # [earliest, latest] centuries when both are known, for index driven period filters
+    creation_period = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                models.Q(earliest_creation__isnull=False, latest_creation__isnull=False, earliest_creation__lte=models.F('latest_creation')),
+                then=models.Func('earliest_creation', 'latest_creation', models.Value('[]'), function='int4range', output_field=IntegerRangeField()),
+            ),
+            default=None,
+            output_field=IntegerRangeField(),
+        ),
+        output_field=IntegerRangeField(),
+        db_persist=True,
+    )
+
     culture_other = models.TextField(null=True, blank=True, verbose_name='culture (unknown)')
     provenance_other = models.TextField(null=True, blank=True, verbose_name='provenance (unknown)')
     provenience_other = models.TextField(null=True, blank=True, verbose_name='provenience (unknown)')
@@ -179,6 +245,8 @@ class Item(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    # denormalized display data kept up to date by `digital_mary.signals`
+    display_cache = models.JSONField(default=dict, blank=True, editable=False)
 
     search_vector = models.GeneratedField(
         expression=SearchVector('name', config='english', weight='A') +
@@ -191,6 +259,13 @@ class Item(models.Model):
         output_field=SearchVectorField(),
         db_persist=True,
     )
+    # `search_vector` plus linked term labels and alternate names, kept up to date by `digital_mary.signals`
+    search_document = SearchVectorField(null=True, editable=False)
+    # labels, Arabic labels and alternate names of every linked term for fuzzy searches (set with `search_document`)
+    term_labels = models.TextField(null=True, editable=False)
+    # plain text shadow of the description and translated inscription for search snippets (set on save)
+    snippet_text = models.TextField(default='', blank=True, editable=False)
+    snippet_text_ar = models.TextField(default='', blank=True, editable=False)
 
     # relationships
     categories = models.ManyToManyField(
@@ -260,11 +335,35 @@ class Item(models.Model):
         indexes = [
             GinIndex(fields=['i18n']),
             GinIndex(fields=['search_vector']),
+            GinIndex(fields=['search_document']),
+            GistIndex(fields=['creation_period'], name='item_creation_period_idx'),
+            trigram_index(models.F('name'), 'item_name_trgm_idx'),
+            trigram_index(KT('i18n__name_ar'), 'item_name_ar_trgm_idx'),
+            trigram_index(models.F('term_labels'), 'item_term_labels_trgm_idx'),
+            prefix_index(models.F('name'), 'item_name_prefix_idx'),
+            prefix_index(KT('i18n__name_ar'), 'item_name_ar_prefix_idx'),
+            # browse ordering and keyset pagination of public items (see `pagination.py`)
+            models.Index(
+                Coalesce('earliest_creation', models.Value(UNKNOWN_PERIOD_ORDER)),
+                Coalesce('latest_creation', models.Value(UNKNOWN_PERIOD_ORDER)),
+                models.F('name'),
+                models.F('id'),
+                name='item_browse_idx',
+                condition=models.Q(is_public=True),
+            ),
         ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # strip html once here instead of on every search
+        self.snippet_text = html_to_text(self.description, self.translated_inscription)
+        self.snippet_text_ar = html_to_text(self.description_ar, self.translated_inscription_ar)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'snippet_text', 'snippet_text_ar'}
+        super().save(*args, **kwargs)
+
     def get_display_date(self):
         if self.display_date:
             return self.display_date
@@ -284,23 +383,85 @@ class Item(models.Model):
             f'{contribution.person.citation_name}.' for contribution in self.contributions.all() if MarcRelator.AUT in contribution.marc_relators
         ]
 
+    def build_display_cache(self):
+        def term_cache(term):
+            return {'pk': term.pk, 'label': term.label, 'description': term.description} if term else None
+
+        image = self.get_first_public_image()
+        return {
+            'display_date': str(self.get_display_date()),
+            'display_periods': str(self.get_display_periods()),
+            'thumbnail': {
+                'url': image.thumbnail.url,
+                'sources': image.get_responsive_sources(),
+                'description': image.description,
+            } if image and image.image and image.thumbnail else None,
+            'public_image_count': self.get_public_image_count(),
+            'private_image_count': self.get_private_image_count(),
+            'remote_image_count': len(self.remote_images.all()),
+            'citation_authors': self.get_citation_authors(),
+            'categories': [term_cache(term) for term in self.categories.all()],
+            'cultures': [term_cache(term) for term in self.cultures.all()],
+            'languages': [term_cache(term) for term in self.languages.all()],
+            'materials': [term_cache(term) for term in self.materials.all()],
+            'techniques': [term_cache(term) for term in self.techniques.all()],
+            'subjects': [term_cache(term) for term in self.subjects.all()],
+            'inscription_style': term_cache(self.inscription_style),
+            'provenance': term_cache(self.provenance),
+            'provenience': term_cache(self.provenience),
+            'findspot': term_cache(self.findspot),
+        }
+
+    def get_display_cache(self):
+        # items saved before the cache existed are built (not saved, read paths never write) until
+        # `refresh_display_cache --missing` backfills them
+        if self.display_cache:
+            return self.display_cache
+        if not hasattr(self, '_built_display_cache'):
+            self._built_display_cache = self.build_display_cache()
+        return self._built_display_cache
+
+    def _filter_prefetched_images(self, is_public):
+        # `public_images` is set by views using `Prefetch('images', ..., to_attr='public_images')`
+        if is_public and hasattr(self, 'public_images'):
+            return self.public_images
+        # filter in python when all images have already been prefetched
+        if 'images' in getattr(self, '_prefetched_objects_cache', {}):
+            return [image for image in self.images.all() if image.is_public == is_public]
+        return None
+
     def get_public_images(self):
+        images = self._filter_prefetched_images(True)
+        if images is not None:
+            return images
         return self.images.filter(is_public=True).all()
 
     def get_first_public_image(self):
+        images = self._filter_prefetched_images(True)
+        if images is not None:
+            return images[0] if len(images) > 0 else None
         return self.images.filter(is_public=True).first()
 
     def get_public_image_count(self):
+        images = self._filter_prefetched_images(True)
+        if images is not None:
+            return len(images)
         return self.images.filter(is_public=True).count()
 
     def get_private_images(self):
+        images = self._filter_prefetched_images(False)
+        if images is not None:
+            return images
         return self.images.filter(is_public=False).all()
 
     def get_private_image_count(self):
+        images = self._filter_prefetched_images(False)
+        if images is not None:
+            return len(images)
         return self.images.filter(is_public=False).count()
 
 
-class Image(models.Model):
+class Image(DerivativesMixin, models.Model):
     name = models.CharField(verbose_name='Image Name', null=True, blank=True)
     is_public = models.BooleanField(db_index=True, default=False, verbose_name='Is Public?')
     image = models.ImageField(
@@ -311,13 +472,17 @@ class Image(models.Model):
     )
     image_width = models.IntegerField(null=True, blank=True)
     image_height = models.IntegerField(null=True, blank=True)
-    thumbnail = AdvanceThumbnailField(
-        source_field='image',
+    # generated in the background (see `DerivativesMixin`)
+    thumbnail = models.ImageField(
         upload_to='thumbnails/',
         null=True,
         blank=True,
-        size=(450, 350),
+        editable=False,
     )
+    # manifest of the responsive widths and formats (see `derivatives.make_responsive_derivatives`)
+    derivatives = models.JSONField(default=dict, blank=True, editable=False)
+    # manifest of the IIIF tile pyramid (see `derivatives.make_tile_pyramid`)
+    tiles = models.JSONField(default=dict, blank=True, editable=False)
     description = models.TextField(null=True, blank=True)
     license = models.TextField(null=True, blank=True)
 
@@ -346,6 +511,43 @@ class Image(models.Model):
     def __str__(self):
         return self.name
 
+    def has_current_derivatives(self):
+        return bool(self.image) and self.derivatives.get('source') == self.image.name
+
+    def has_current_tiles(self):
+        return bool(self.image) and self.tiles.get('source') == self.image.name
+
+    def has_stale_derivatives(self):
+        return super().has_stale_derivatives() or (bool(self.image) and not (self.has_current_derivatives() and self.has_current_tiles()))
+
+    def get_derivative_files(self):
+        return super().get_derivative_files() + [
+            name for image_format in self.derivatives.get('formats', []) for _, name in image_format['sources']
+        ]
+
+    def get_tiles_directory(self):
+        return f'{IIIF_DIRECTORY}/{self.pk}'
+
+    def build_derivatives(self, source, image):
+        self.derivatives = make_responsive_derivatives(source, image)
+        self.tiles = make_tile_pyramid(source, self.get_tiles_directory(), image)
+        return super().build_derivatives(source, image) + ['derivatives', 'tiles']
+
+    def get_responsive_sources(self):
+        """
+        Returns `[{type, srcset}]` for `<picture>` sources (empty until generated for the current image).
+        """
+        if not self.has_current_derivatives():
+            return []
+        storage = self.image.storage
+        return [
+            {
+                'type': image_format['type'],
+                'srcset': ', '.join(f'{storage.url(name)} {width}w' for width, name in image_format['sources']),
+            }
+            for image_format in self.derivatives['formats'] if image_format['sources']
+        ]
+
 class RemoteImage(models.Model):
     name = models.CharField(verbose_name='Image Name', null=True, blank=True)
     url = models.URLField(blank=False)
@@ -420,4 +622,36 @@ class Contribution(models.Model):
         return f'{self.person if self.person else 'N/A'} ({self.get_roles()})'
 
     def get_roles(self):
-        return ', '.join([MarcRelator(marc_relator).label for marc_relator in self.marc_relators])
\ No newline at end of file
+        return ', '.join([MarcRelator(marc_relator).label for marc_relator in self.marc_relators])
+
+class ContentVersion(models.Model):
+    key = models.CharField(primary_key=True)
+    version = models.BigIntegerField(default=0)
+
+    # write tracking fields
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'digital_mary_content_version'
+
+    def __str__(self):
+        return f'{self.key} ({self.version})'
+
+class DerivativeJob(models.Model):
+    # one pending job per object, see `digital_mary.jobs`
+    model = models.CharField()
+    object_id = models.BigIntegerField()
+    # jobs queued again while running are kept for another run
+    requested = models.DateTimeField()
+    available = models.DateTimeField(db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'digital_mary_derivative_job'
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id'], name='derivative_job_unique_object'),
+        ]
+
+    def __str__(self):
+        return f'{self.model} {self.object_id}'
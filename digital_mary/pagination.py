@@ -0,0 +1,107 @@
+from functools import reduce
+import json
+from operator import or_
+
+from django.core import signing
+from django.core.paginator import Paginator
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from .models import UNKNOWN_PERIOD_ORDER
+
+# matches the `item_browse_idx` index (keyset values must never be null)
+BROWSE_ORDERING = ['browse_earliest', 'browse_latest', 'name', 'pk']
+CURSOR_SALT = 'digital_mary.items.cursor'
+
+def get_browse_annotations():
+    return {
+        'browse_earliest': Coalesce('earliest_creation', Value(UNKNOWN_PERIOD_ORDER)),
+        'browse_latest': Coalesce('latest_creation', Value(UNKNOWN_PERIOD_ORDER)),
+    }
+
+class ItemPaginator(Paginator):
+    """
+    Page numbers only cover the first `max_page_number` pages (counted exactly up to there),
+    deeper pages are reached with keyset cursors (deeper page numbers are redirected to one by `ItemsView`)
+    and the total is estimated by the query planner.
+    """
+    max_page_number = 10
+
+    @property
+    def count_limit(self):
+        return self.per_page * self.max_page_number
+
+    @cached_property
+    def count(self):
+        count = self.object_list[:self.count_limit + 1].count()
+        if count > self.count_limit:
+            plan = json.loads(self.object_list.explain(format='json'))
+            count = max(int(plan[0]['Plan']['Plan Rows']), count)
+        return count
+
+    @property
+    def is_count_estimated(self):
+        # also means there are items beyond the numbered pages
+        return self.count > self.count_limit
+
+    @cached_property
+    def num_pages(self):
+        return min(super().num_pages, self.max_page_number)
+
+class RankedSearchPaginator(Paginator):
+    """
+    Pages over a list of ranked item ids (see `search.get_ranked_item_ids`) and only loads the items of the page.
+    """
+    def __init__(self, item_ids, per_page, queryset, limit, **kwargs):
+        super().__init__(item_ids, per_page, **kwargs)
+        self.queryset = queryset
+        self.limit = limit
+
+    @property
+    def is_truncated(self):
+        return self.count >= self.limit
+
+    def _get_page(self, item_ids, number, paginator):
+        items = self.queryset.in_bulk(item_ids)
+        return super()._get_page([items[pk] for pk in item_ids if pk in items], number, paginator)
+
+class KeysetPage:
+    """
+    A page after a cursor, only links to the next page (and back to the first numbered page).
+    """
+    is_keyset = True
+    next_url = None
+    first_url = None
+
+    def __init__(self, object_list, paginator, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+def get_keyset_values(item):
+    return [getattr(item, field) for field in BROWSE_ORDERING]
+
+def encode_cursor(item):
+    return signing.dumps(get_keyset_values(item), salt=CURSOR_SALT, compress=True)
+
+def decode_cursor(cursor):
+    # raises `signing.BadSignature` for invalid cursors
+    return signing.loads(cursor, salt=CURSOR_SALT)
+
+def keyset_after(values):
+    # (a, b, c, d) > (w, x, y, z) expanded so each branch can use the browse index
+    conditions = [
+        Q(**{f'{field}__gt': values[index]}, **dict(zip(BROWSE_ORDERING[:index], values[:index])))
+        for index, field in enumerate(BROWSE_ORDERING)
+    ]
+    return Q(**{f'{BROWSE_ORDERING[0]}__gte': values[0]}) & reduce(or_, conditions)
@@ -0,0 +1,250 @@
+from functools import reduce
+from hashlib import md5
+from operator import or_
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, TrigramWordSimilarity
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q, Value
+from django.db.models.fields.json import KT
+from django.db.models.functions import Greatest, Left
+from django.utils.html import escape
+
+from .models import NormalizeArabic, Category, Culture, InscriptionStyle, Language, \
+    Location, Material, Subject, Technique, Item
+from .facets import M2M_FACETS, get_search_cache_key
+
+SEARCH_CONFIGS = ['english', 'arabic']
+# hamza/alef variants, alef maksura and teh marbuta are folded, diacritics and tatweel removed
+# (mirrored by the `digital_mary_normalize_arabic` sql function of migration 0016)
+ARABIC_NORMALIZATION = str.maketrans(
+    'آأإٱىؤئة',
+    'اااايويه',
+    ''.join(chr(code) for code in range(0x064B, 0x0656)) + '\u0670\u0640',
+)
+# item m2m field names whose term labels are part of the search document (all of them are part of `Item.term_labels`)
+DOCUMENT_M2M_FIELDS = ['categories', 'cultures', 'materials', 'techniques', 'subjects']
+DOCUMENT_LOCATION_FIELDS = ['provenance', 'provenience', 'findspot']
+# term model => item search form filter name
+SUGGESTION_TERM_FILTERS = {
+    Category: 'category',
+    Culture: 'culture',
+    InscriptionStyle: 'inscription_style',
+    Language: 'language',
+    Location: 'location',
+    Material: 'material',
+    Subject: 'subject',
+    Technique: 'technique',
+}
+# ts_headline parses the whole text so long descriptions are cut before highlighting
+SNIPPET_TEXT_LIMIT = 10000
+SNIPPET_OPTIONS = {'max_words': 30, 'min_words': 15, 'max_fragments': 2, 'fragment_delimiter': ' … '}
+# control characters never appear in the stripped text so the highlights survive html escaping
+SNIPPET_START, SNIPPET_STOP = '\x02', '\x03'
+SUGGESTION_LIMIT = 8
+SUGGESTION_MIN_LENGTH = 2
+# ranked searches keep (and page through) the ids of the best matches only
+RANKED_RESULT_LIMIT = 1000
+# share of the name similarity (0-1) added to the full text rank
+TRIGRAM_RANK_WEIGHT = 0.5
+
+def normalize_arabic(text):
+    return text.translate(ARABIC_NORMALIZATION)
+
+def get_search_query(q):
+    return reduce(or_, [
+        SearchQuery(normalize_arabic(q) if config == 'arabic' else q, config=config, search_type='websearch')
+        for config in SEARCH_CONFIGS
+    ])
+
+def normalize_search_text(q):
+    return ' '.join(q.split()).lower()
+
+def search_items(queryset, q, fuzzy=True):
+    """
+    Filters items matching the full text query and annotates a `rank`.
+
+    Fuzzy searches also match item names and linked term labels with similar spellings,
+    the name similarity is blended into the rank.
+    """
+    query = get_search_query(q)
+    condition = Q(search_document=query)
+    # cover density ranking (`ts_rank_cd`) favours matches close to each other
+    rank = SearchRank(F('search_document'), query, cover_density=True)
+    if fuzzy:
+        # every branch has its own index so postgres combines them with a bitmap OR instead of a scan
+        queryset = queryset.alias(name_ar_text=KT('i18n__name_ar'))
+        condition |= Q(name__trigram_word_similar=q) | Q(name_ar_text__trigram_word_similar=q) | \
+            Q(term_labels__trigram_word_similar=q)
+        rank = rank + Greatest(
+            TrigramWordSimilarity(q, 'name'),
+            TrigramWordSimilarity(q, 'name_ar_text'),
+        ) * TRIGRAM_RANK_WEIGHT
+    return queryset.filter(condition).annotate(rank=rank * 100)
+
+def get_ranked_item_ids(queryset, search_data, content_version):
+    """
+    Returns the ids of the top `RANKED_RESULT_LIMIT` items of the ranked search queryset, cached per normalized
+    search and content version so paging through a broad query never ranks the matches again.
+    """
+    cache_key = get_search_cache_key('item_ranked_ids', search_data, content_version)
+    item_ids = cache.get(cache_key)
+    if item_ids is None:
+        item_ids = list(queryset.values_list('pk', flat=True)[:RANKED_RESULT_LIMIT])
+        cache.set(cache_key, item_ids, settings.SEARCH_CACHE_SECONDS)
+    return item_ids
+
+def normalize_arabic_sql(expression):
+    return f"digital_mary_normalize_arabic(coalesce({expression}, ''))"
+
+def _term_labels_sql(term_model, item_id_sql, join_sql, in_document=True):
+    term_table = term_model._meta.db_table
+    alternate_names = "array_to_string(term.alternate_names, ' ')" if term_model in (Location, Subject) else 'NULL'
+    return f'''
+        SELECT {item_id_sql} AS item_id, term.label, term.i18n->>'label_ar' AS label_ar, {alternate_names} AS alternate_names,
+            {'TRUE' if in_document else 'FALSE'} AS in_document
+        {join_sql}
+        JOIN {term_table} term ON term.id = t.term_id
+    '''
+
+def refresh_search_documents(item_ids):
+    """
+    Rebuilds `Item.search_document` (the item's own `search_vector` plus the English and Arabic labels
+    and alternate names of its linked terms) and `Item.term_labels` (the same text for every linked term,
+    matched by fuzzy searches) so searches never join the term tables.
+
+    Arabic text is added normalized (see `ARABIC_NORMALIZATION`) to match the normalized Arabic query.
+    """
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    item_table = Item._meta.db_table
+
+    selects = []
+    for field_name in M2M_FACETS.values():
+        field = Item._meta.get_field(field_name)
+        through = field.remote_field.through._meta
+        term_column = through.get_field(field.m2m_reverse_field_name()).column
+        item_column = through.get_field(field.m2m_field_name()).column
+        selects.append(_term_labels_sql(
+            field.related_model,
+            f't.{item_column}',
+            f'FROM (SELECT {item_column}, {term_column} AS term_id FROM {through.db_table} WHERE {item_column} = ANY(%(item_ids)s)) t',
+            field_name in DOCUMENT_M2M_FIELDS,
+        ))
+    # only matched by fuzzy searches
+    inscription_style_column = Item._meta.get_field('inscription_style').column
+    selects.append(_term_labels_sql(
+        InscriptionStyle,
+        't.id',
+        f'FROM (SELECT id, {inscription_style_column} AS term_id FROM {item_table} WHERE id = ANY(%(item_ids)s)) t',
+        False,
+    ))
+    location_columns = ', '.join(f'(i.{Item._meta.get_field(field_name).column})' for field_name in DOCUMENT_LOCATION_FIELDS)
+    selects.append(_term_labels_sql(
+        Location,
+        'i.id',
+        f'FROM {item_table} i CROSS JOIN LATERAL (VALUES {location_columns}) AS t(term_id)',
+    ) + ' WHERE i.id = ANY(%(item_ids)s)')
+
+    sql = f'''
+        WITH item_terms AS ({' UNION ALL '.join(selects)})
+        UPDATE {item_table} i SET search_document = i.search_vector
+            || setweight(to_tsvector('arabic', {normalize_arabic_sql("i.i18n->>'name_ar'")}), 'A')
+            || setweight(to_tsvector('arabic', {normalize_arabic_sql("i.i18n->>'description_ar'")}), 'B')
+            || setweight(to_tsvector('arabic', {normalize_arabic_sql("i.i18n->>'translated_inscription_ar'")}), 'B')
+            || setweight(to_tsvector('english', coalesce(d.labels, '')), 'B')
+            || setweight(to_tsvector('arabic', {normalize_arabic_sql('d.labels_ar')}), 'B')
+            || setweight(to_tsvector('simple', coalesce(d.alternate_names, '')), 'C'),
+            term_labels = d.term_labels
+        FROM (
+            SELECT ids.id,
+                string_agg(t.label, ' ') FILTER (WHERE t.in_document) AS labels,
+                string_agg(t.label_ar, ' ') FILTER (WHERE t.in_document) AS labels_ar,
+                string_agg(t.alternate_names, ' ') FILTER (WHERE t.in_document) AS alternate_names,
+                concat_ws(' ', string_agg(t.label, ' '), string_agg(t.label_ar, ' '), string_agg(t.alternate_names, ' ')) AS term_labels
+            FROM unnest(%(item_ids)s::int[]) AS ids(id)
+            LEFT JOIN item_terms t ON t.item_id = ids.id
+            GROUP BY ids.id
+        ) d
+        WHERE i.id = d.id
+    '''
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {'item_ids': item_ids})
+
+def normalize_suggestion_prefix(prefix):
+    return normalize_search_text(prefix)[:100]
+
+def _prefix_matches(queryset, suggestion_type, field_name, prefix):
+    # `istartswith` lookups use the indexes of `prefix_index`
+    return queryset \
+        .alias(text_ar=KT(f'i18n__{field_name}_ar')) \
+        .filter(Q(**{f'{field_name}__istartswith': prefix}) | Q(text_ar__istartswith=prefix)) \
+        .order_by(field_name) \
+        .annotate(
+            suggestion_type=Value(suggestion_type),
+            suggestion_pk=F('pk'),
+            suggestion_label=F(field_name),
+            suggestion_label_ar=KT(f'i18n__{field_name}_ar'),
+        ) \
+        .values_list('suggestion_type', 'suggestion_pk', 'suggestion_label', 'suggestion_label_ar')[:SUGGESTION_LIMIT]
+
+def get_suggestions(prefix):
+    """
+    Returns public item names and term labels (English or Arabic) starting with the prefix (one query).
+    """
+    querysets = [_prefix_matches(Item.objects.filter(is_public=True), 'item', 'name', prefix)] + [
+        _prefix_matches(model.objects.all(), filter_name, 'label', prefix)
+        for model, filter_name in SUGGESTION_TERM_FILTERS.items()
+    ]
+    types = ['item'] + list(SUGGESTION_TERM_FILTERS.values())
+    type_labels = {'item': 'Item'} | {
+        filter_name: str(model._meta.verbose_name).capitalize()
+        for model, filter_name in SUGGESTION_TERM_FILTERS.items()
+    }
+    rows = sorted(querysets[0].union(*querysets[1:], all=True), key=lambda row: (types.index(row[0]), row[2]))
+    return [
+        {
+            'type': suggestion_type,
+            'type_label': type_labels[suggestion_type],
+            'pk': pk,
+            'label': label,
+            'label_ar': label_ar,
+        }
+        for suggestion_type, pk, label, label_ar in rows
+    ]
+
+def _headline(expression, query, config):
+    return SearchHeadline(
+        expression, query, config=config,
+        start_sel=SNIPPET_START, stop_sel=SNIPPET_STOP, **SNIPPET_OPTIONS,
+    )
+
+def get_search_snippets(items, q, item_versions):
+    """
+    Returns `{item_pk: html}` highlighted snippets for the items of one page, cached by item version and query.
+
+    `item_versions` is `{item_pk: content_version}`, the English snippet is used unless only the Arabic text matches.
+    """
+    query_key = md5(normalize_search_text(q).encode()).hexdigest()
+    cache_keys = {item.pk: f'snippet:{item.pk}:{item_versions[item.pk]}:{query_key}' for item in items}
+    cached = cache.get_many(cache_keys.values())
+    snippets = {pk: cached[key] for pk, key in cache_keys.items() if key in cached}
+
+    missing = [pk for pk in cache_keys if pk not in snippets]
+    if missing:
+        query = get_search_query(q)
+        rows = Item.objects.filter(pk__in=missing).annotate(
+            snippet=_headline(Left('snippet_text', SNIPPET_TEXT_LIMIT), query, 'english'),
+            # highlighting needs the same normalization as the query (snippets lose Arabic diacritics)
+            snippet_ar=_headline(NormalizeArabic(Left('snippet_text_ar', SNIPPET_TEXT_LIMIT)), query, 'arabic'),
+        ).values_list('pk', 'snippet', 'snippet_ar')
+        new_snippets = {}
+        for pk, snippet, snippet_ar in rows:
+            if snippet_ar and SNIPPET_START in snippet_ar and SNIPPET_START not in (snippet or ''):
+                snippet = snippet_ar
+            new_snippets[pk] = escape(snippet or '').replace(SNIPPET_START, '<mark>').replace(SNIPPET_STOP, '</mark>')
+        cache.set_many({cache_keys[pk]: snippet for pk, snippet in new_snippets.items()}, settings.CACHE_SECONDS)
+        snippets.update(new_snippets)
+    return snippets
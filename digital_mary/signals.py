@@ -0,0 +1,87 @@
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Category, Culture, InscriptionStyle, Language, Location, Material, \
+    Subject, Technique, Item, Image, RemoteImage, Person, Contribution
+from .caching import queue_content_change
+from .jobs import queue_derivatives
+
+# item lookups for each term model
+TERM_ITEM_LOOKUPS = {
+    Category: ['categories'],
+    Culture: ['cultures'],
+    InscriptionStyle: ['inscription_style'],
+    Language: ['languages'],
+    Location: ['provenance', 'provenience', 'findspot'],
+    Material: ['materials'],
+    Subject: ['subjects'],
+    Technique: ['techniques'],
+}
+ITEM_TERM_THROUGH_MODELS = [
+    Item.categories.through,
+    Item.cultures.through,
+    Item.languages.through,
+    Item.materials.through,
+    Item.subjects.through,
+    Item.techniques.through,
+]
+
+def get_term_item_ids(term):
+    lookups = TERM_ITEM_LOOKUPS[type(term)]
+    return Item.objects.filter(reduce(or_, [Q(**{lookup: term}) for lookup in lookups])).values_list('pk', flat=True)
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_changed(sender, instance, **kwargs):
+    queue_content_change([instance.pk])
+
+@receiver(m2m_changed)
+def item_terms_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if sender not in ITEM_TERM_THROUGH_MODELS:
+        return
+    if not reverse:
+        if action in ['post_add', 'post_remove', 'post_clear']:
+            queue_content_change([instance.pk])
+    elif action in ['post_add', 'post_remove']:
+        queue_content_change(pk_set)
+    elif action == 'pre_clear':
+        # refresh runs on commit, after the clear
+        queue_content_change(get_term_item_ids(instance))
+
+def term_saved(sender, instance, created, **kwargs):
+    # new terms have no items but still change the search form options
+    queue_content_change([] if created else get_term_item_ids(instance))
+
+def term_deleted(sender, instance, **kwargs):
+    # m2m rows are removed without m2m_changed so collect the items before the delete
+    queue_content_change(get_term_item_ids(instance))
+
+for term_model in TERM_ITEM_LOOKUPS.keys():
+    post_save.connect(term_saved, sender=term_model, dispatch_uid=f'content_change_{term_model.__name__}_saved')
+    pre_delete.connect(term_deleted, sender=term_model, dispatch_uid=f'content_change_{term_model.__name__}_deleted')
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+@receiver(post_save, sender=RemoteImage)
+@receiver(post_delete, sender=RemoteImage)
+@receiver(post_save, sender=Contribution)
+@receiver(post_delete, sender=Contribution)
+def item_child_changed(sender, instance, **kwargs):
+    queue_content_change([instance.item_id])
+
+@receiver(post_save, sender=Image)
+def image_saved(sender, instance, **kwargs):
+    if instance.has_stale_derivatives():
+        queue_derivatives([instance])
+
+@receiver(post_save, sender=Person)
+def person_saved(sender, instance, created, **kwargs):
+    queue_content_change([] if created else instance.contributions.values_list('item_id', flat=True))
+
+@receiver(post_delete, sender=Person)
+def person_deleted(sender, instance, **kwargs):
+    queue_content_change()
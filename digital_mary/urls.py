@@ -8,5 +8,14 @@ urlpatterns = [
     path('', views.HomeView.as_view(), name='home'),
     path('about', views.AboutView.as_view(), name='about'),
     path('items', views.ItemsView.as_view(), name='items'),
+    path('items/suggest', views.SuggestView.as_view(), name='suggest'),
+    path('items/timeline', views.TimelineView.as_view(), name='timeline'),
+    path('items/export.<str:export_format>', views.ExportView.as_view(), name='export'),
+    path('map/locations', views.MapLocationsView.as_view(), name='map_locations'),
+    path('map/tiles/<int:z>/<int:x>/<int:y>.mvt', views.MapTileView.as_view(), name='map_tile'),
     path('items/<int:pk>', views.ItemView.as_view(), name='item'),
+    path('items/<int:pk>/nearby', views.ItemNearbyView.as_view(), name='item_nearby'),
+    path('iiif/<int:pk>', views.IIIFBaseView.as_view(), name='iiif_base'),
+    path('iiif/<int:pk>/info.json', views.IIIFInfoView.as_view(), name='iiif_info'),
+    path('iiif/<int:pk>/<str:region>/<str:size>/<str:rotation>/<str:quality>.<str:image_format>', views.IIIFImageView.as_view(), name='iiif_image'),
 ]
\ No newline at end of file
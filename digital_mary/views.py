@@ -1,22 +1,43 @@
 from functools import reduce
-from operator import or_
+from hashlib import md5
+from operator import and_, or_
+from urllib.parse import urlencode
 
 from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.files.storage import default_storage
 from django.core.mail import send_mail
+from django.http import Http404, FileResponse, HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.utils.safestring import mark_safe
 from django.contrib.sites.shortcuts import get_current_site
 from django.template.loader import render_to_string
 from django.urls import reverse
+from django.views import View
 from django.views.generic import TemplateView, DetailView, ListView
 from django.views.generic.edit import FormMixin, ModelFormMixin
-from django.db.models import F, Q
-from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db.models import Q, Prefetch, Exists, OuterRef, prefetch_related_objects
+from django.db.backends.postgresql.psycopg_any import NumericRange
 from django.contrib import messages
 
-from .models import Item
+from .models import Item, Image, Contribution
 from .forms import ItemSearchForm
+from .facets import get_facet_counts
+from .export import get_export_name, save_export, EXPORT_FORMATS, EXPORT_LOCK_SECONDS
+from .iiif import get_info, parse_request, render_image, IIIFRequestError, IIIF_CONTENT_TYPE
+from .maps import get_location_clusters, get_tile, is_valid_bbox, is_valid_tile, filter_items_near, get_nearby_items, MAX_ZOOM
+from .search import search_items, get_ranked_item_ids, get_search_snippets, get_suggestions, \
+    normalize_suggestion_prefix, RANKED_RESULT_LIMIT, SUGGESTION_MIN_LENGTH
+from .pagination import ItemPaginator, KeysetPage, RankedSearchPaginator, BROWSE_ORDERING, get_browse_annotations, \
+    encode_cursor, decode_cursor, keyset_after
+from .caching import CachedResponseMixin, ConditionalResponseMixin, get_content_version, \
+    get_content_versions, get_item_content_version_key, ABOUT_CONTENT_VERSION
 from digital_mary_challenges.forms import ChallengeForm
 
-class HomeView(TemplateView):
+class HomeView(ConditionalResponseMixin, CachedResponseMixin, TemplateView):
     template_name = 'home.html'
 
     def get_context_data(self, **kwargs):
@@ -24,8 +45,9 @@ class HomeView(TemplateView):
         context['item_search_form'] = ItemSearchForm()
         return context
 
-class AboutView(TemplateView):
+class AboutView(ConditionalResponseMixin, CachedResponseMixin, TemplateView):
     template_name = 'about.html'
+    content_version_keys = [ABOUT_CONTENT_VERSION]
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -34,71 +56,378 @@ class AboutView(TemplateView):
         ]
         return context
 
-class ItemsView(ListView):
-    paginate_by = 24
-    model = Item
-    template_name = 'items.html'
-    ordering = ['earliest_creation', 'latest_creation', 'name']
+# item m2m field name => search form filter name
+ITEM_TERM_FILTERS = {
+    'categories': 'category',
+    'cultures': 'culture',
+    'languages': 'language',
+    'materials': 'material',
+    'subjects': 'subject',
+    'techniques': 'technique',
+}
 
-    def get_queryset(self):
-        queryset = super().get_queryset() \
+def item_terms_exist(field_name, terms):
+    # EXISTS over the m2m table avoids duplicate rows and extra join paths when filters are combined
+    field = Item._meta.get_field(field_name)
+    return Exists(field.remote_field.through.objects.filter(**{
+        field.m2m_field_name(): OuterRef('pk'),
+        f'{field.m2m_reverse_field_name()}__in': terms,
+    }))
+
+class ItemSearchMixin:
+    """
+    Filters public items with the `ItemSearchForm` of the request (sets `search_data` to the cleaned data).
+    """
+    ordering = BROWSE_ORDERING
+
+    def get_ordering(self):
+        return self.ordering
+
+    def get_search_queryset(self):
+        # cards read the denormalized `display_cache` so no relations are needed
+        queryset = Item.objects \
+            .annotate(**get_browse_annotations()) \
             .filter(is_public=True) \
-            .prefetch_related('images', 'remote_images')
+            .order_by(*self.get_ordering())
 
+        self.search_data = {}
+        # facet name => condition of its selected values, kept apart for the facet counts (see `get_facet_querysets`)
+        self.facet_conditions = {}
         form = ItemSearchForm(self.request.GET)
         if form.is_valid():
-            data = form.cleaned_data
+            data = self.search_data = form.cleaned_data
 
             if data.get('q'):
-                query = reduce(or_, [SearchQuery(data.get('q'), config=language, search_type='websearch') for language in ['english', 'arabic']])
-                queryset = queryset \
-                    .filter(search_vector=query) \
-                    .annotate(rank=SearchRank(F('search_vector'), query) * 100) \
+                queryset = search_items(queryset, data.get('q'), fuzzy=data.get('spelling') != 'exact') \
                     .order_by('-rank', *self.get_ordering())
 
-            if data.get('category'):
-                queryset = queryset.filter(categories=data.get('category'))
-            if data.get('culture'):
-                queryset = queryset.filter(cultures=data.get('culture'))
+            # `any` ORs the selected values of a filter, `all` ANDs them (different filters are always ANDed)
+            combine = and_ if data.get('match') == 'all' else or_
+
+            for field_name, filter_name in ITEM_TERM_FILTERS.items():
+                if data.get(filter_name):
+                    if combine is or_:
+                        self.facet_conditions[filter_name] = item_terms_exist(field_name, data.get(filter_name))
+                    else:
+                        self.facet_conditions[filter_name] = reduce(and_, [item_terms_exist(field_name, [term]) for term in data.get(filter_name)])
             if data.get('inscription_style'):
-                queryset = queryset.filter(inscription_style=data.get('inscription_style'))
-            if data.get('language'):
-                queryset = queryset.filter(languages=data.get('language'))
+                self.facet_conditions['inscription_style'] = reduce(combine, [Q(inscription_style=inscription_style) for inscription_style in data.get('inscription_style')])
             if data.get('location'):
-                queryset = queryset.filter(Q(findspot=data.get('location')) | Q(provenance=data.get('location')) | Q(provenience=data.get('location')))
-            if data.get('technique'):
-                queryset = queryset.filter(techniques=data.get('technique'))
+                self.facet_conditions['location'] = reduce(combine, [
+                    Q(findspot=location) | Q(provenance=location) | Q(provenience=location)
+                    for location in data.get('location')
+                ])
+            # `creation_period` range lookups use its GiST index
             if data.get('period'):
-                queryset = queryset.filter(
-                    (Q(earliest_creation__lte=data.get('period')) | Q(earliest_creation__isnull=True)) &
-                    (Q(latest_creation__gte=data.get('period')) | Q(latest_creation__isnull=True)) &
-                    ~(Q(earliest_creation__isnull=True) | Q(latest_creation__isnull=True))
-                )
-            if data.get('material'):
-                queryset = queryset.filter(materials=data.get('material'))
-            if data.get('subject'):
-                queryset = queryset.filter(subjects=data.get('subject'))
+                self.facet_conditions['period'] = reduce(combine, [
+                    Q(creation_period__contains=period)
+                    for period in data.get('period')
+                ])
+            if data.get('period_from') is not None or data.get('period_to') is not None:
+                queryset = queryset.filter(creation_period__overlap=NumericRange(data.get('period_from'), data.get('period_to'), '[]'))
+            if data.get('near'):
+                queryset = filter_items_near(queryset, data.get('near'), data.get('within'))
+
+        self.unfaceted_queryset = queryset
+        return self.filter_facets(queryset)
 
+    def filter_facets(self, queryset, exclude=None):
+        for facet, condition in self.facet_conditions.items():
+            if facet != exclude:
+                queryset = queryset.filter(condition)
         return queryset
 
+    def get_facet_querysets(self):
+        """
+        Returns `{facet_name: queryset}` of the items each facet is counted over: with `any`, the options of a
+        facet with a selection widen the results so they are counted without the facet's own selection.
+        """
+        if self.search_data.get('match') == 'all':
+            return {}
+        return {facet: self.filter_facets(self.unfaceted_queryset, exclude=facet) for facet in self.facet_conditions}
+
+class ItemsView(ItemSearchMixin, ConditionalResponseMixin, CachedResponseMixin, ListView):
+    paginate_by = 24
+    model = Item
+    template_name = 'items.html'
+
+    def get_queryset(self):
+        return self.get_search_queryset()
+
+    def get(self, request, *args, **kwargs):
+        # numbered pages beyond `ItemPaginator.max_page_number` (old links, crawlers) continue with a cursor
+        page_number = request.GET.get('page', '')
+        if page_number.isdigit() and int(page_number) > ItemPaginator.max_page_number and not request.GET.get('cursor'):
+            queryset = self.get_queryset()
+            if not self.search_data.get('q'):
+                return redirect(self.get_deep_page_url(queryset, int(page_number)))
+        return super().get(request, *args, **kwargs)
+
+    def get_deep_page_url(self, queryset, page_number):
+        # a single offset query finds the item before the page, the rest of the page is read with the keyset
+        cursor_item = queryset[(page_number - 1) * self.paginate_by - 1:].first()
+        if cursor_item is None:
+            params = self.request.GET.copy()
+            params['page'] = 'last'
+            return f'?{params.urlencode()}'
+        return self.get_page_url(cursor_item)
+
+    def get_paginator(self, queryset, per_page, **kwargs):
+        # relevance ordering has no keyset so search results page through the cached top ranked ids
+        if self.search_data.get('q'):
+            item_ids = get_ranked_item_ids(queryset, self.search_data, get_content_version(self.request))
+            return RankedSearchPaginator(item_ids, per_page, Item.objects.filter(is_public=True), RANKED_RESULT_LIMIT, **kwargs)
+        return ItemPaginator(queryset, per_page, **kwargs)
+
+    def get_page_url(self, cursor_item=None):
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        params.pop('cursor', None)
+        if cursor_item is not None:
+            params['cursor'] = encode_cursor(cursor_item)
+        return f'?{params.urlencode()}'
+
+    def paginate_queryset(self, queryset, page_size):
+        cursor = self.request.GET.get('cursor')
+        if not cursor or self.search_data.get('q'):
+            paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+            # the last numbered page continues with a cursor instead of deep offsets
+            if isinstance(paginator, ItemPaginator) and page.number == paginator.num_pages and paginator.is_count_estimated:
+                page.next_url = self.get_page_url(page[len(page) - 1])
+            return paginator, page, object_list, is_paginated
+
+        try:
+            values = decode_cursor(cursor)
+        except signing.BadSignature:
+            raise Http404('Invalid cursor.')
+        paginator = self.get_paginator(queryset, page_size)
+        # one extra row tells if there is a next page without counting
+        object_list = list(queryset.filter(keyset_after(values))[:page_size + 1])
+        page = KeysetPage(object_list[:page_size], paginator, has_next=len(object_list) > page_size)
+        page.first_url = self.get_page_url()
+        if page.has_next():
+            page.next_url = self.get_page_url(page.object_list[-1])
+        return paginator, page, page.object_list, True
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['breadcrumbs'] = [
             {'label': 'Items', 'url': reverse('items')},
         ]
-        context['item_search_form'] = ItemSearchForm(self.request.GET)
+        context['item_search_form'] = ItemSearchForm(
+            self.request.GET,
+            facet_counts=get_facet_counts(self.object_list, self.search_data, get_content_version(self.request), self.get_facet_querysets()),
+        )
+        if self.search_data.get('q'):
+            # highlighted snippets for the current page only
+            items = list(context['object_list'])
+            versions = get_content_versions(self.request, [get_item_content_version_key(item.pk) for item in items])
+            snippets = get_search_snippets(items, self.search_data.get('q'), {
+                item.pk: versions[get_item_content_version_key(item.pk)][0] for item in items
+            })
+            for item in items:
+                item.search_snippet = mark_safe(snippets.get(item.pk, ''))
         return context
 
+class TimelineView(ItemSearchMixin, ConditionalResponseMixin, View):
+    """
+    Number of matching public items per century (JSON) for the search filters of the request.
+
+    Reads the period facet counts, so it is usually answered from the facet cache of the item list.
+    """
+    def get(self, request, *args, **kwargs):
+        facet_counts = get_facet_counts(self.get_search_queryset(), self.search_data, get_content_version(request), self.get_facet_querysets())
+        return JsonResponse({
+            'periods': [
+                {'period': value, 'label': str(label), 'count': facet_counts['period'].get(value, 0)}
+                for value, label in Item.Periods.choices if value is not None
+            ],
+        })
 
-class ItemView(FormMixin, DetailView):
+class ExportView(View):
+    """
+    Sends every public item as csv, json lines or json-ld (see `export.py` and the `export_items` command).
+
+    The export is written to media storage once per content version, then sent by nginx (X-Accel-Redirect).
+    """
+    def get(self, request, export_format, *args, **kwargs):
+        if export_format not in EXPORT_FORMATS:
+            raise Http404('Unknown export format.')
+        base_url = request.build_absolute_uri('/').rstrip('/')
+        content_version = get_content_version(request)
+        name = get_export_name(export_format, base_url, content_version)
+        storage = default_storage
+        if not storage.exists(name):
+            # a single worker writes a new export, concurrent requests retry later
+            lock_key = f'export_lock:{name}'
+            if not cache.add(lock_key, True, EXPORT_LOCK_SECONDS):
+                return HttpResponse('The export is being prepared, please retry in a minute.', status=503, headers={'Retry-After': '60'})
+            try:
+                save_export(storage, name, export_format, content_version, base_url)
+            finally:
+                cache.delete(lock_key)
+
+        filename = f'digital-mary-items.{export_format}'
+        if request.headers.get('X-Sendfile-Type') == 'X-Accel-Redirect':
+            response = HttpResponse(content_type=EXPORT_FORMATS[export_format])
+            response.headers['X-Accel-Redirect'] = f'/{settings.MEDIA_URL.strip("/")}/{name}'
+            response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        else:
+            response = FileResponse(storage.open(name), as_attachment=True, filename=filename, content_type=EXPORT_FORMATS[export_format])
+        return response
+
+class MapLocationsView(ConditionalResponseMixin, View):
+    """
+    GeoJSON of the located public items inside `bbox` (west,south,east,north), clustered for `zoom`.
+    """
+    def get(self, request, *args, **kwargs):
+        try:
+            bbox = [float(value) for value in request.GET.get('bbox', '-180,-90,180,90').split(',')]
+            zoom = min(max(int(request.GET.get('zoom', 0)), 0), MAX_ZOOM)
+        except ValueError:
+            return HttpResponseBadRequest('Invalid bbox or zoom.')
+        if not is_valid_bbox(bbox):
+            return HttpResponseBadRequest('Invalid bbox.')
+        return JsonResponse(get_location_clusters(bbox, zoom))
+
+class MapTileView(ConditionalResponseMixin, View):
+    """
+    Mapbox Vector Tile (`locations` layer) of the located public items, cached per tile and content version.
+    """
+    def get(self, request, z, x, y, *args, **kwargs):
+        if not is_valid_tile(z, x, y):
+            raise Http404('Invalid tile.')
+        return HttpResponse(get_tile(z, x, y, get_content_version(request)), content_type='application/vnd.mapbox-vector-tile')
+
+class SuggestView(View):
+    """
+    Search-as-you-type suggestions (JSON), memoized per prefix for `SUGGEST_CACHE_SECONDS`.
+    """
+    def get(self, request, *args, **kwargs):
+        prefix = normalize_suggestion_prefix(request.GET.get('q', ''))
+        suggestions = []
+        if len(prefix) >= SUGGESTION_MIN_LENGTH:
+            cache_key = 'suggest:' + md5(prefix.encode()).hexdigest()
+            suggestions = cache.get(cache_key)
+            if suggestions is None:
+                suggestions = get_suggestions(prefix)
+                for suggestion in suggestions:
+                    if suggestion['type'] == 'item':
+                        suggestion['url'] = reverse('item', kwargs={'pk': suggestion['pk']})
+                    else:
+                        suggestion['url'] = reverse('items') + '?' + urlencode({suggestion['type']: suggestion['pk']})
+                cache.set(cache_key, suggestions, settings.SUGGEST_CACHE_SECONDS)
+
+        response = JsonResponse({'q': prefix, 'suggestions': suggestions})
+        patch_cache_control(response, public=True, max_age=settings.SUGGEST_CACHE_SECONDS)
+        return response
+
+class ItemNearbyView(ConditionalResponseMixin, View):
+    """
+    Public items found near an item (JSON, distance ordered), loaded separately so item pages keep their per-item cache.
+    """
+    def resolve_object(self):
+        self.object = Item.objects.filter(is_public=True, pk=self.kwargs['pk']).select_related('findspot', 'provenience', 'provenance').first()
+        if self.object is None:
+            raise Http404('Item not found.')
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({'items': get_nearby_items(self.object, get_content_version(request))})
+
+class IIIFImageMixin:
+    def get_image(self, request, pk):
+        # public images (or any for staff previews) with a tile pyramid for the current file
+        queryset = Image.objects.select_related('item')
+        if not request.user.is_staff:
+            queryset = queryset.filter(is_public=True, item__is_public=True)
+        image = queryset.filter(pk=pk).first()
+        if image is None or not image.has_current_tiles():
+            raise Http404('Image not found.')
+        return image
+
+    def finalize_response(self, image, response, etag):
+        # viewers on other sites can load the images
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers.setdefault('ETag', etag)
+        if image.is_public and image.item.is_public:
+            # tiles never change for a given source so browsers and proxies skip the permission check
+            patch_cache_control(response, public=True, max_age=settings.IIIF_CACHE_SECONDS)
+        else:
+            # staff previews must not be kept by shared caches
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+class IIIFBaseView(View):
+    def get(self, request, pk, *args, **kwargs):
+        return redirect('iiif_info', pk=pk, permanent=False)
+
+class IIIFInfoView(IIIFImageMixin, View):
+    """
+    IIIF Image API 3 (level 1) image information of a public image.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        image = self.get_image(request, pk)
+        etag = quote_etag(f'{settings.GIT_COMMIT_SHORT}-' + md5(image.tiles['source'].encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            base_url = request.build_absolute_uri(reverse('iiif_base', kwargs={'pk': image.pk}))
+            response = JsonResponse(get_info(image, base_url), content_type=IIIF_CONTENT_TYPE)
+        return self.finalize_response(image, response, etag)
+
+class IIIFImageView(IIIFImageMixin, View):
+    """
+    IIIF Image API 3 (level 1) image requests. Tiles of the pyramid are sent by nginx from the internal
+    `/media/iiif` location once permitted (this view only sends them without nginx), other requests are
+    rendered from the source image.
+    """
+    def get(self, request, pk, region, size, rotation, quality, image_format, *args, **kwargs):
+        image = self.get_image(request, pk)
+        etag = quote_etag(md5(f'{image.tiles["source"]}:{request.path}'.encode()).hexdigest())
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            try:
+                box, image_size = parse_request(image, region, size, rotation, quality, image_format)
+            except IIIFRequestError as e:
+                return HttpResponseBadRequest(str(e))
+            # validated parameters are safe in storage paths
+            name = f'{image.get_tiles_directory()}/{region}/{size}/{rotation}/{quality}.{image_format}'
+            storage = image.image.storage
+            if storage.exists(name) and request.headers.get('X-Sendfile-Type') == 'X-Accel-Redirect':
+                response = HttpResponse(content_type='image/jpeg')
+                # not percent-encoded, validated tile paths only contain digits and commas
+                response.headers['X-Accel-Redirect'] = f'/{settings.MEDIA_URL.strip("/")}/{name}'
+            elif storage.exists(name):
+                response = FileResponse(storage.open(name), content_type='image/jpeg')
+            else:
+                response = HttpResponse(render_image(image, box, image_size), content_type='image/jpeg')
+        return self.finalize_response(image, response, etag)
+
+class ItemView(ConditionalResponseMixin, FormMixin, DetailView):
     model = Item
     template_name = 'item.html'
     form_class = ChallengeForm
 
+    def get_content_version_keys(self):
+        return [get_item_content_version_key(self.kwargs['pk'])]
+
     def get_queryset(self):
-        return super().get_queryset() \
-            .filter(is_public=True) \
-            .prefetch_related('images', 'remote_images')
+        return super().get_queryset().filter(is_public=True)
+
+    def resolve_object(self):
+        self.object = self.get_object()
+
+    def prefetch_object(self):
+        # only needed to render the page, not to answer a 304
+        prefetch_related_objects(
+            [self.object],
+            'images', 'remote_images',
+            Prefetch('contributions', queryset=Contribution.objects.select_related('person')),
+        )
+
+    def get(self, request, *args, **kwargs):
+        # `object` was looked up by `resolve_object`
+        self.prefetch_object()
+        return self.render_to_response(self.get_context_data(object=self.object))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -106,6 +435,11 @@ class ItemView(FormMixin, DetailView):
             {'label': 'Items', 'url': reverse('items')},
             {'label': self.object.name, 'url': reverse('item', kwargs={'pk': self.object.pk})},
         ]
+        # the challenge form has a csrf token so only the item details are cached (see `item.html`)
+        context['cache_seconds'] = settings.CACHE_SECONDS
+        context['content_version'] = get_content_version(self.request, self.get_content_version_keys())
+        # the citation is part of the cached details so it never includes the query string of the request
+        context['citation_url'] = self.request.build_absolute_uri(reverse('item', kwargs={'pk': self.object.pk}))
         return context
 
     def get_success_url(self):
@@ -116,7 +450,7 @@ class ItemView(FormMixin, DetailView):
         self.object = self.get_object()
         if form.is_valid():
             challenge = form.save(commit=False)
-            challenge.item = self.get_object()
+            challenge.item = self.object
             challenge.save()
             messages.success(request, f'Challenge successfully sent.')
             if len(settings.EMAIL_CHALLENGE_RECIPIENTS) > 0:
@@ -134,4 +468,5 @@ class ItemView(FormMixin, DetailView):
             return self.form_valid(form)
         else:
             messages.error(request, 'Please correct the challenge errors below.')
+            self.prefetch_object()
             return self.form_invalid(form)
@@ -105,11 +105,13 @@ TEMPLATES = [
     },
 ]
 
+# shared cache tier selected with `CACHE_URL` (https://django-environ.readthedocs.io/en/latest/types.html#environ-env-cache-url)
+# - `filecache:///django-cache` (default) file cache shared by the workers of one container
+# - `dbcache://django_cache` database cache shared by every worker and container
+# - `locmemcache://` in-process LRU cache per worker
+# - `pymemcache://memcached:11211` or `rediscache://redis:6379/0` (requires `pymemcache` or `redis`)
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        'LOCATION': '/django-cache',
-    }
+    'default': env.cache('CACHE_URL', default='filecache:///django-cache'),
 }
 ONE_MINUTE = 60
 ONE_HOUR = ONE_MINUTE * 60
@@ -117,7 +119,11 @@ ONE_DAY = ONE_HOUR * 24
 ONE_WEEK = ONE_DAY * 7
 ONE_MONTH = ONE_DAY * 30
 ONE_YEAR = ONE_DAY * 365
-CACHE_SECONDS = 1 if DEBUG else env('CACHE_SECONDS', default=ONE_WEEK) # 1 second if debugging else default 1 week
+CACHE_SECONDS = 1 if DEBUG else env.int('CACHE_SECONDS', default=ONE_MONTH) # 1 second if debugging else default 1 month (invalidated by content versions)
+FACET_CACHE_SECONDS = 1 if DEBUG else env.int('FACET_CACHE_SECONDS', default=CACHE_SECONDS) # search facet counts (keyed by content version)
+SEARCH_CACHE_SECONDS = 1 if DEBUG else env.int('SEARCH_CACHE_SECONDS', default=CACHE_SECONDS) # ranked search result ids (keyed by content version)
+SUGGEST_CACHE_SECONDS = 1 if DEBUG else env.int('SUGGEST_CACHE_SECONDS', default=ONE_MINUTE * 5) # search suggestions per prefix (not versioned so kept short)
+IIIF_CACHE_SECONDS = 1 if DEBUG else env.int('IIIF_CACHE_SECONDS', default=ONE_WEEK) # browser and proxy cache of public IIIF tiles and info.json (urls stay the same when an image file is replaced)
 
 WSGI_APPLICATION = 'digital_mary_app.wsgi.application'
 
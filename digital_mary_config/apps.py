@@ -5,3 +5,5 @@ class DigitalMaryConfig(AppConfig):
     name = 'digital_mary_config'
     verbose_name = 'Digital Mary Config'
 
+    def ready(self):
+        from . import signals
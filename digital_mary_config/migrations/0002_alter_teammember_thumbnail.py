@@ -0,0 +1,18 @@
+# Generated by Django 6.0.3 on 2026-10-17 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('digital_mary_config', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='teammember',
+            name='thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='thumbnails/'),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.utils.safestring import mark_safe
 from solo.models import SingletonModel
-from django_advance_thumbnail import AdvanceThumbnailField
+from digital_mary.derivatives import DerivativesMixin
 
 # abstract Models
 
@@ -24,7 +24,7 @@ class AboutPage(SingletonModel):
     def __str__(self):
         return 'About Page'
 
-class TeamMember(models.Model):
+class TeamMember(DerivativesMixin, models.Model):
     name = models.CharField()
     profile = models.TextField()
     image = models.ImageField(
@@ -32,13 +32,14 @@ class TeamMember(models.Model):
         help_text=mark_safe('Please use <u><a href="https://developer.mozilla.org/en-US/docs/Web/Media/Formats/Image_types" target="_blank">standard web image types</a></u>. PNG, JPEG, and WebP are recommended.'),
         verbose_name='Profile Picture',
     )
-    thumbnail = AdvanceThumbnailField(
-        source_field='image',
+    # generated in the background (see `DerivativesMixin`)
+    thumbnail = models.ImageField(
         upload_to='thumbnails/',
         null=True,
         blank=True,
-        size=(150, 150),
+        editable=False,
     )
+    thumbnail_size = (150, 150)
     order = models.PositiveIntegerField(
         default=0,
         blank=False,
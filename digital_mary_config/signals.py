@@ -0,0 +1,18 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from digital_mary.caching import queue_content_change, ABOUT_CONTENT_VERSION
+from digital_mary.jobs import queue_derivatives
+from .models import AboutPage, TeamMember
+
+@receiver(post_save, sender=AboutPage)
+@receiver(post_delete, sender=AboutPage)
+@receiver(post_save, sender=TeamMember)
+@receiver(post_delete, sender=TeamMember)
+def about_page_changed(sender, instance, **kwargs):
+    queue_content_change(version_keys=[ABOUT_CONTENT_VERSION])
+
+@receiver(post_save, sender=TeamMember)
+def team_member_saved(sender, instance, **kwargs):
+    if instance.has_stale_derivatives():
+        queue_derivatives([instance])
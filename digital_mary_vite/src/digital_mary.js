@@ -10,6 +10,7 @@ import 'bootstrap/dist/js/bootstrap.bundle.min.js'
 import 'glider-js/glider.min.js'
 import { Popover } from 'bootstrap'
 import Viewer from 'viewerjs'
+import OpenSeadragon from 'openseadragon'
 
 /* Basic scripts for the Digital Mary Project
  */
@@ -38,6 +39,9 @@ import LazyLoad from 'dhilux/js/lazyload.js';
         enhanceLazyLoad();
         makeHamburgers();
         makeAccordions();
+        makeSearchSuggestions();
+        makeTimelines();
+        makeNearbyItems();
         cleanupText();
 
         document.querySelectorAll('[data-bs-toggle="popover"]').forEach((popoverTriggerEl) => {
@@ -66,6 +70,67 @@ import LazyLoad from 'dhilux/js/lazyload.js';
         });
     }
 
+    function makeSearchSuggestions(){
+        document.querySelectorAll('input[data-suggest-url]').forEach(input => {
+            $(input).autocomplete({
+                minLength: 2,
+                delay: 150,
+                source: (request, response) => {
+                    $.getJSON(input.dataset.suggestUrl, { q: request.term })
+                        .done(data => response(data.suggestions.map(suggestion => ({
+                            label: `${suggestion.label}${suggestion.label_ar ? ` / ${suggestion.label_ar}` : ''} (${suggestion.type_label})`,
+                            value: suggestion.label,
+                            url: suggestion.url,
+                        }))))
+                        .fail(() => response([]));
+                },
+                select: (e, ui) => {
+                    window.location.href = ui.item.url;
+                },
+            });
+        });
+    }
+
+    function makeTimelines(){
+        // loaded after the page so the histogram never delays the item list
+        document.querySelectorAll('.timeline[data-timeline-url]').forEach(timeline => {
+            fetch(timeline.dataset.timelineUrl)
+                .then(response => response.json())
+                .then(data => {
+                    let max = Math.max(1, ...data.periods.map(period => period.count));
+                    data.periods.forEach(period => {
+                        let bar = document.createElement('div');
+                        bar.classList.add('timeline-bar');
+                        bar.title = `${period.label}: ${period.count}`;
+                        bar.style.setProperty('--timeline-value', period.count / max);
+                        timeline.appendChild(bar);
+                    });
+                })
+                .catch(() => timeline.remove());
+        });
+    }
+
+    function makeNearbyItems(){
+        document.querySelectorAll('.item-nearby[data-nearby-url]').forEach(nearby => {
+            let list = nearby.querySelector('.item-nearby__list');
+            fetch(nearby.dataset.nearbyUrl)
+                .then(response => response.json())
+                .then(data => {
+                    data.items.forEach(item => {
+                        let li = document.createElement('li');
+                        let link = document.createElement('a');
+                        link.href = item.url;
+                        link.textContent = item.name;
+                        li.appendChild(link);
+                        li.appendChild(document.createTextNode(` (${item.location}, ${item.distance_km} km)`));
+                        list.appendChild(li);
+                    });
+                    nearby.hidden = data.items.length === 0;
+                })
+                .catch(() => nearby.remove());
+        });
+    }
+
     function cleanupText(){
     // Hacks for fixing up the descriptions
     // Clean up some descriptions, but this is a hack
@@ -115,7 +180,8 @@ import LazyLoad from 'dhilux/js/lazyload.js';
                     if (link.classList.contains('img-tool-info')){
                         imgSlider.querySelectorAll('details > summary').forEach(s => s.click());
                     } else if (link.classList.contains('img-tool-zoom')){
-                        gallery.view(i);
+                        let tiled = div.querySelector('a[data-iiif]');
+                        tiled ? makeDeepZoom(tiled) : gallery.view(i);
                     }
                 })
             }
@@ -148,7 +214,8 @@ import LazyLoad from 'dhilux/js/lazyload.js';
         let currTitle;
         gallery = new Viewer(imgCtr, {
             url: (img) => {
-                return img.parentNode.getAttribute('data-img');
+                // thumbnails can be wrapped in a <picture>
+                return img.closest('a[data-img]').getAttribute('data-img');
             },
             title: (img) => {
                 //Set the current title for easy access later
@@ -186,10 +253,47 @@ import LazyLoad from 'dhilux/js/lazyload.js';
             a.classList.add('zoomable');
             a.addEventListener('click', e => {
                 e.preventDefault();
+                // tiled images open in the deep zoom viewer instead
+                if (a.dataset.iiif){
+                    e.stopPropagation();
+                    makeDeepZoom(a);
+                }
             })
         });
     }
 
+    function makeDeepZoom(a){
+        /*  IIIF tile viewer: only the tiles in view at the current zoom are loaded
+            instead of the full resolution original
+        */
+        let overlay = document.createElement('div');
+        overlay.classList.add('dm-deep-zoom');
+        overlay.innerHTML = '<button class="dm-deep-zoom__close" aria-label="Close"><i class="bi bi-x-lg"></i></button><div class="dm-deep-zoom__viewer"></div>';
+        dmViewerContainer.appendChild(overlay);
+        document.body.classList.add('viewer-open');
+
+        let deepZoom = OpenSeadragon({
+            element: overlay.querySelector('.dm-deep-zoom__viewer'),
+            tileSources: a.dataset.iiif,
+            showNavigationControl: false,
+            showNavigator: true,
+            crossOriginPolicy: 'Anonymous',
+        });
+        let close = () => {
+            deepZoom.destroy();
+            overlay.remove();
+            document.body.classList.remove('viewer-open');
+            document.removeEventListener('keydown', closeOnEscape);
+        };
+        let closeOnEscape = e => {
+            if (e.key === 'Escape'){
+                close();
+            }
+        };
+        overlay.querySelector('.dm-deep-zoom__close').addEventListener('click', close);
+        document.addEventListener('keydown', closeOnEscape);
+    }
+
 
     // Let's do some browse lazy loading...
     function enhanceLazyLoad(){
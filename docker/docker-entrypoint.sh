@@ -3,7 +3,9 @@ set -e
 
 # app specific setup here
 python manage.py migrate
+python manage.py createcachetable
 python manage.py remove_stale_contenttypes --include-stale-apps --noinput
+python manage.py refresh_display_cache --missing
 
 mkdir -p /app/static
 chown $MEDIA_FOLDER_UID:$MEDIA_FOLDER_GID /app/static
@@ -18,8 +20,8 @@ export GIT_TAG=$(git tag --points-at HEAD | head -n 1)
 # fix media folder permissions for nginx
 MEDIA_FOLDER_UID=${MEDIA_FOLDER_UID-101}
 MEDIA_FOLDER_GID=${MEDIA_FOLDER_GID-101}
-mkdir -p /media/images /media/thumbnails
-chown $MEDIA_FOLDER_UID:$MEDIA_FOLDER_GID /media /media/images /media/thumbnails
+mkdir -p /media/images /media/thumbnails /media/derivatives /media/iiif /media/exports
+chown $MEDIA_FOLDER_UID:$MEDIA_FOLDER_GID /media /media/images /media/thumbnails /media/derivatives /media/iiif /media/exports
 mkdir -p /static-vite/dist/assets
 chown $MEDIA_FOLDER_UID:$MEDIA_FOLDER_GID /static-vite/dist /static-vite/dist/assets
 